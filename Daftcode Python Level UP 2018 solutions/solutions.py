@@ -3,9 +3,10 @@ import numpy as np
 from utils import download_file
 from zadanie1.task1 import count_characters
 from zadanie2.task2 import primesfrom2to, approximate_prime
-from zadanie34.task34_prep import process_text, load_data
+from zadanie34.task34_cache import cached_solve
+from zadanie34.task34_prep import process_text
 from zadanie34.task34_utils import show_short_info
-from zadanie34.task34 import simple_bottom_up
+from zadanie34.task34 import bottom_up_method
 
 
 def solve_task1():
@@ -64,7 +65,7 @@ def solve_task3():
     '''
 
     # Numba’s JIT compiler warm up
-    simple_bottom_up(3, np.fromiter('123456789', dtype=np.uint8))
+    bottom_up_method(3, 0, np.fromiter('123456789', dtype=np.uint8))
 
     url = 'https://raw.githubusercontent.com/daftcode/python_levelup_2018/master/zadania_rekrutacyjne/Zadanie_3/zadanie_3_triangle_small.txt'
 
@@ -72,13 +73,11 @@ def solve_task3():
 
     filepath = process_text(filepath)
 
-    root_node, nlvls, flat_triangle = load_data(filepath)[:3]
+    output = cached_solve(filepath, bottom_up_method)
 
-    show_short_info(nlvls)
+    show_short_info(output['nlvls'])
 
-    output = simple_bottom_up(nlvls, flat_triangle)
-
-    print('The highest sum of nodes:', output + root_node, end='\n\n')
+    print('The highest sum of nodes:', output['total'] + output['root_node'], end='\n\n')
 
 
 def solve_task4():
@@ -90,7 +89,7 @@ def solve_task4():
     '''
 
     # Numba’s JIT compiler warm up
-    simple_bottom_up(3, np.fromiter('123456789', dtype=np.uint8))
+    bottom_up_method(3, 0, np.fromiter('123456789', dtype=np.uint8))
 
     url = 'https://raw.githubusercontent.com/daftcode/python_levelup_2018/master/zadania_rekrutacyjne/Zadanie_4/zadanie_4_triangle_big.txt'
 
@@ -98,13 +97,11 @@ def solve_task4():
 
     filepath = process_text(filepath)
 
-    root_node, nlvls, flat_triangle = load_data(filepath)[:3]
-
-    show_short_info(nlvls)
+    output = cached_solve(filepath, bottom_up_method)
 
-    output = simple_bottom_up(nlvls, flat_triangle)
+    show_short_info(output['nlvls'])
 
-    print('The highest sum of nodes:', output + root_node, end='\n\n')
+    print('The highest sum of nodes:', output['total'] + output['root_node'], end='\n\n')
 
 
 if __name__ == '__main__':
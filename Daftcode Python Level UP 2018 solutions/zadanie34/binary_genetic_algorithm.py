@@ -3,11 +3,22 @@
 '''Binary genetic algorithm engine'''
 
 
+from collections import namedtuple
+
 import numpy as np
-from numba import jit
+
+from zadanie34.chromosome_packing import crossover_packed, generate_packed, mutate_packed, unpack
+
+
+# Options of run function beyond the parameters of the classic algorithm:
+# -- packed -- boolean, if chromosomes are packed into 64-bit words;
+# -- fit_cache -- FitnessCache object or None, cache of fitness values;
+# -- elite -- non-negative integer, number of chromosomes carried unchanged;
+# -- replace_rate -- positive real number, fraction of the population replaced.
+GAOptions = namedtuple('GAOptions', ('packed', 'fit_cache', 'elite', 'replace_rate'),
+                       defaults=(False, None, 0, 1.0))
 
 
-@jit
 def generate(pop_size, chrom_length):
     '''
     Inputs:
@@ -36,10 +47,9 @@ def generate(pop_size, chrom_length):
 
     assert pop_size < (1 << chrom_length)  # 2 ** chrom_length
 
-    return np.random.randint(low=0, high=2, size=(pop_size, chrom_length)).astype(np.bool)
+    return np.random.randint(low=0, high=2, size=(pop_size, chrom_length)).astype(np.bool_)
 
 
-@jit
 def select(population, scores, indexes):
     '''
     Inputs:
@@ -77,7 +87,6 @@ def select(population, scores, indexes):
     return population[indexes]
 
 
-@jit
 def mutate(population, mut_prob):
     '''
     Inputs:
@@ -106,7 +115,6 @@ def mutate(population, mut_prob):
     return population ^ bits_to_mutate
 
 
-@jit
 def crossover(population, crs_prob, bits):
     '''
     Inputs:
@@ -162,7 +170,41 @@ def crossover(population, crs_prob, bits):
     ), axis=0)
 
 
-@jit(nopython=False, cache=True, parallel=False)
+def breed(population, scores, indexes, bits, crs_prob, mut_prob, packed):
+    '''
+    Inputs:
+
+    population -- nested (2D) numpy array, chromosomes (boolean or packed)
+
+    scores -- array of fitness values corresponding to chromosomes
+
+    indexes -- 1D numpy integer array, indexes of chromosomes in the population
+
+    bits -- 1D numpy integer array, indexes of bits in a chromosome
+
+    crs_prob -- positive real number, crossover (recombination) probability
+
+    mut_prob -- positive real number, mutation rate
+
+    packed -- boolean, if chromosomes are packed into 64-bit words
+
+
+    Returns nested (2D) numpy array, the next generation of chromosomes
+    (selected, recombined and mutated).
+    '''
+
+    population = select(population, scores, indexes)
+
+    if packed:
+        population = crossover_packed(population, crs_prob, bits.size)
+        population = mutate_packed(population, mut_prob, bits.size)
+    else:
+        population = crossover(population, crs_prob, bits)
+        population = mutate(population, mut_prob)
+
+    return population
+
+
 def run(fit_func,
         crs_prob,
         mut_prob,
@@ -170,13 +212,15 @@ def run(fit_func,
         pop_size,
         iterations,
         fit_args=None,
-        threshold=1.0):
+        threshold=1.0,
+        options=GAOptions()):
     '''
     Inputs:
 
     fit_func
     -- fitness function
     -- first positional argument must be a nested (2D) numpy boolean array
+       (or uint64 array of packed chromosomes if packed is True)
     -- must return 1D numpy array with real numbers between
        0 (invalid sequence) and 1 (perfect fitness) and size
        equal to the number of rows of the given numpy array
@@ -218,6 +262,30 @@ def run(fit_func,
        a given number of iterations (preferably a perfect fitness
        or an exact match)
 
+    options
+    -- GAOptions named tuple (default is GAOptions()), its fields are described below
+
+    packed
+    -- boolean (default is False)
+    -- if True, chromosomes are packed into 64-bit words (see chromosome_packing module)
+       and the fitness function receives packed chromosomes, it can unpack
+       them (unpack function) or work on words directly
+
+    fit_cache
+    -- FitnessCache object or None (default)
+    -- if given, the fitness function is called only for distinct chromosomes
+       that are not in the cache, statistics are kept by the cache object
+
+    elite
+    -- non-negative integer number (default is 0), less than pop_size
+    -- number of the best chromosomes carried unchanged to the next generation
+
+    replace_rate
+    -- positive real number less than or equal to 1 (default is 1)
+    -- fraction of the population replaced in each generation, the worst
+       chromosomes are replaced by offspring (steady-state replacement)
+    -- default is 1, the whole population is replaced (generational replacement)
+
 
     The fitness function operates on numpy arrays: for a given population
     of chromosomes it must return corresponding fitness values.
@@ -229,11 +297,15 @@ def run(fit_func,
     The highest fitted chromosome is returned even if the minimum fitness threshold
     condition is not satisfied within a given number of generations.
 
+    With elitism or steady-state replacement the best chromosomes stay
+    in the population (and keep breeding), instead of being kept aside.
+    Only offspring are evaluated, fitness values of survivors are known.
+
 
     Returns a chromosome (1D numpy boolean array).
     '''
 
-    assert (pop_size % 2) is 0
+    assert (pop_size % 2) == 0
     assert (crs_prob > 0) and (crs_prob < 1)
     assert (mut_prob > 0) and (mut_prob < 1)
     assert (threshold >= 0) and (threshold <= 1)
@@ -242,8 +314,12 @@ def run(fit_func,
         fit_args = []
 
     # Create initial population and calculate corresponding fitness values
-    population = generate(pop_size, chrom_length)
-    scores = fit_func(population, *fit_args)
+    if options.packed:
+        population = generate_packed(pop_size, chrom_length)
+    else:
+        population = generate(pop_size, chrom_length)
+
+    scores = evaluate(fit_func, population, fit_args, options)
 
     # Find the best candidate from current generation
     alpha = np.argmax(scores)
@@ -262,13 +338,8 @@ def run(fit_func,
         if alpha_score >= threshold:
             break
 
-        # Recreate population
-        population = select(population, scores, indexes)
-        population = crossover(population, crs_prob, bits)
-        population = mutate(population, mut_prob)
-
-        # Recalculate fitness values
-        scores = fit_func(population, *fit_args)
+        population, scores = next_generation(fit_func, population, scores, indexes, bits,
+                                             crs_prob, mut_prob, fit_args, options)
 
         alpha = np.argmax(scores)
 
@@ -276,4 +347,108 @@ def run(fit_func,
             alpha_chromosome = population[alpha]
             alpha_score = scores[alpha]
 
+    if options.packed:
+        return unpack(alpha_chromosome[np.newaxis], chrom_length)[0]
+
     return alpha_chromosome
+
+
+def next_generation(fit_func, population, scores, indexes, bits, crs_prob, mut_prob, fit_args,
+                    options):
+    '''
+    Inputs:
+
+    fit_func, crs_prob, mut_prob, fit_args, options -- the same as in run function
+
+    population -- nested (2D) numpy array, chromosomes of the current generation
+
+    scores -- 1D numpy array of real numbers, their fitness values
+
+    indexes, bits -- 1D numpy arrays, rows and columns index of population
+
+
+    Recreates population, offspring take places of chromosomes that do not
+    survive (see count_survivors function), only offspring are evaluated.
+
+
+    Returns a tuple with two elements: the next generation and its fitness values.
+    '''
+
+    # Number of the best chromosomes that survive to the next generation
+    nsurvivors = count_survivors(population.shape[0], options)
+
+    offspring = breed(population, scores, indexes, bits, crs_prob, mut_prob, options.packed)
+    offspring = offspring[nsurvivors:]
+
+    return survive(population, scores, offspring,
+                   evaluate(fit_func, offspring, fit_args, options))
+
+
+def count_survivors(pop_size, options):
+    '''
+    Inputs:
+
+    pop_size -- positive integer number, total number of chromosomes in a generation
+
+    options -- GAOptions named tuple, elite and replace_rate fields are used
+
+
+    Returns a non-negative integer, number of the best chromosomes
+    that survive to the next generation (less than pop_size).
+    '''
+
+    assert (options.replace_rate > 0) and (options.replace_rate <= 1)
+
+    nsurvivors = max(options.elite, pop_size - int(round(options.replace_rate * pop_size)))
+
+    assert (nsurvivors >= 0) and (nsurvivors < pop_size)
+
+    return nsurvivors
+
+
+def evaluate(fit_func, population, fit_args, options):
+    '''
+    Inputs:
+
+    fit_func, fit_args -- the same as in run function
+
+    population -- nested (2D) numpy array, chromosomes (boolean or packed)
+
+    options -- GAOptions named tuple, packed and fit_cache fields are used
+
+
+    Returns 1D numpy array of real numbers, a fitness value for each chromosome.
+    '''
+
+    if options.fit_cache is None:
+        return fit_func(population, *fit_args)
+
+    return options.fit_cache.evaluate(fit_func, population, fit_args, options.packed)
+
+
+def survive(population, scores, offspring, offspring_scores):
+    '''
+    Inputs:
+
+    population, offspring -- nested (2D) numpy arrays, chromosomes
+
+    scores, offspring_scores -- 1D numpy arrays of real numbers, their fitness values
+
+
+    The best chromosomes of population keep their places, offspring
+    replace all other chromosomes (generational replacement if there
+    are as many offspring as chromosomes in population).
+
+
+    Returns a tuple with two elements: the next generation and its fitness values.
+    '''
+
+    nsurvivors = population.shape[0] - offspring.shape[0]
+
+    if not nsurvivors:
+        return offspring, offspring_scores
+
+    survivors = np.argsort(scores)[-nsurvivors:]
+
+    return (np.concatenate((population[survivors], offspring), axis=0),
+            np.concatenate((scores[survivors], offspring_scores)))
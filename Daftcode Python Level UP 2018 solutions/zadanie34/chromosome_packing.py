@@ -0,0 +1,215 @@
+#!/usr/bin/python3
+
+'''Packed chromosomes for the binary genetic algorithm engine'''
+
+
+import numpy as np
+
+
+# Packed chromosomes: bits of each chromosome are stored in 64-bit unsigned
+# words, bit j in word j // 64 at position j % 64 (least significant bit first).
+# Bits after the end of a chromosome in its last word are always zero.
+# A population is a nested (2D) numpy uint64 array, a row per chromosome,
+# 8 times smaller than the same population of boolean arrays.
+
+
+def word_masks(chrom_length):
+    '''
+    Inputs:
+
+    chrom_length
+    -- positive integer number
+    -- number of bits in a chromosome
+
+
+    Returns 1D numpy uint64 array, a mask of used bits for each word
+    of a packed chromosome (all bits are set except in the last word).
+    '''
+
+    masks = np.full(shape=(chrom_length + 63) >> 6, fill_value=~np.uint64(0), dtype=np.uint64)
+
+    if chrom_length & 63:
+        masks[-1] = (np.uint64(1) << np.uint64(chrom_length & 63)) - np.uint64(1)
+
+    return masks
+
+
+def pack(population):
+    '''
+    Inputs:
+
+    population
+    -- array of chromosomes
+    -- each chromosome must be represented as 1D numpy boolean array
+
+
+    Returns nested (2D) numpy uint64 array, the same chromosomes packed into words.
+    '''
+
+    nrows, chrom_length = population.shape
+
+    nbytes = 8 * ((chrom_length + 63) >> 6)
+
+    packed = np.zeros(shape=(nrows, nbytes), dtype=np.uint8)
+    packed[:, :(chrom_length + 7) >> 3] = np.packbits(population, axis=1, bitorder='little')
+
+    # Words are little-endian, whatever the byte order of the machine
+    return packed.view('<u8').astype(np.uint64, copy=False)
+
+
+def unpack(population, chrom_length):
+    '''
+    Inputs:
+
+    population -- nested (2D) numpy uint64 array, packed chromosomes
+
+    chrom_length
+    -- positive integer number
+    -- number of bits in a chromosome
+
+
+    Returns nested (2D) numpy boolean array, the same chromosomes unpacked.
+    '''
+
+    octets = population.astype('<u8', copy=False).view(np.uint8)
+
+    return np.unpackbits(octets, axis=1, count=chrom_length, bitorder='little').view(np.bool_)
+
+
+def generate_packed(pop_size, chrom_length):
+    '''
+    Inputs:
+
+    pop_size
+    -- positive integer number
+    -- total number of chromosomes in a generation
+
+    chrom_length
+    -- positive integer number
+    -- number of bits in a chromosome
+
+
+    Packed counterpart of generate function, random words are drawn
+    directly, without creating a boolean array.
+
+
+    Returns nested (2D) numpy uint64 array, the entire population
+    of packed chromosomes (solution candidates).
+    '''
+
+    assert pop_size < (1 << chrom_length)  # 2 ** chrom_length
+
+    masks = word_masks(chrom_length)
+
+    population = np.random.randint(low=0, high=1 << 64, size=(pop_size, masks.size),
+                                   dtype=np.uint64)
+
+    return population & masks
+
+
+def mutate_packed(population, mut_prob, chrom_length):
+    '''
+    Inputs:
+
+    population -- nested (2D) numpy uint64 array, packed chromosomes
+
+    mut_prob
+    -- positive real number
+    -- mutation rate
+    -- probability that a bit will be inverted
+
+    chrom_length
+    -- positive integer number
+    -- number of bits in a chromosome
+
+
+    Packed counterpart of mutate function. Instead of drawing a random number
+    for every bit, only positions of inverted bits are drawn: distances
+    between them follow the geometric distribution, so each bit is still
+    inverted independently with the same probability. Inverted bits are
+    combined into masks and applied to words with XOR.
+
+
+    Returns nested (2D) numpy uint64 array, the entire population of packed
+    chromosomes (solution candidates) with randomly altered bits.
+    '''
+
+    total = population.shape[0] * chrom_length
+
+    size = int(total * mut_prob) + 1
+
+    # Positions of inverted bits in all chromosomes (concatenated)
+    positions = np.cumsum(np.random.geometric(p=mut_prob, size=size)) - 1
+
+    while positions[-1] < total:
+        gaps = np.random.geometric(p=mut_prob, size=size)
+        positions = np.concatenate((positions, positions[-1] + np.cumsum(gaps)))
+
+    positions = positions[positions < total]
+
+    rows, bits = np.divmod(positions, chrom_length)
+
+    masks = np.left_shift(np.uint64(1), (bits & 63).astype(np.uint64))
+
+    mutated = population.copy()
+
+    # Several bits can be inverted in the same word
+    np.bitwise_xor.at(mutated, (rows, bits >> 6), masks)
+
+    return mutated
+
+
+def crossover_packed(population, crs_prob, chrom_length):
+    '''
+    Inputs:
+
+    population
+    -- nested (2D) numpy uint64 array, packed chromosomes
+    -- number of chromosomes must be even
+
+    crs_prob
+    -- positive real number
+    -- crossover (recombination) probability
+    -- probability that a pair of chromosomes will exchange
+       part of bit sequences
+
+    chrom_length
+    -- positive integer number
+    -- number of bits in a chromosome
+
+
+    Packed counterpart of crossover function. Words before a crossover bit
+    are taken as a whole, the word with the crossover bit is split with
+    a mask of its lower bits.
+
+
+    Returns nested (2D) numpy uint64 array, the entire population of packed
+    chromosomes (solution candidates) where random chromosome pairs swapped
+    their binary pattern.
+    '''
+
+    # Get the number of pairs and the number of words
+    rows, cols = population.shape
+
+    rows >>= 1  # rows //= 2
+
+    # Select pairs of chromosomes for which sequences of bits will be exchanged
+    pairs = np.random.uniform(size=(rows, 1)) < crs_prob
+
+    # Set a single crossover bit for each pair of chromosomes
+    breakpoints = np.random.randint(low=1, high=chrom_length, size=(rows, 1))
+
+    # Number of bits of each word that come before the crossover bit
+    nbits = np.clip(breakpoints - 64 * np.arange(cols), 0, 64).astype(np.uint64)
+
+    lower = (np.uint64(1) << (nbits & np.uint64(63))) - np.uint64(1)
+
+    positions = np.where(nbits == 64, ~np.uint64(0), lower)
+
+    # Keep information of bit positions only for selected pairs
+    positions = np.where(pairs, positions, np.uint64(0))
+
+    return np.concatenate((
+        (population[0::2] &  positions) | (population[1::2] & ~positions),
+        (population[0::2] & ~positions) | (population[1::2] &  positions)
+    ), axis=0)
@@ -0,0 +1,135 @@
+#!/usr/bin/python3
+
+'''Cache of fitness values for the binary genetic algorithm engine'''
+
+
+from collections import OrderedDict
+
+import numpy as np
+
+from zadanie34.chromosome_packing import pack
+
+
+class FitnessCache:
+    '''
+    Bounded cache of fitness values, keyed by bytes of packed chromosomes.
+
+    After a few generations most chromosomes are copies of others, so
+    duplicates within a generation are evaluated once and chromosomes
+    evaluated in earlier generations are not evaluated again. The least
+    recently used values are removed when the number of values exceeds
+    the limit. The fitness function must return the same value for the same
+    chromosome (its additional arguments must not change between calls).
+
+    Attributes:
+
+    max_entries -- positive integer, maximum number of stored values
+
+    requests -- non-negative integer, number of chromosomes that needed a fitness value
+
+    duplicates -- non-negative integer, number of copies of chromosomes
+                  within the same generation
+
+    hits -- non-negative integer, number of distinct chromosomes found in the cache
+
+    evaluations -- non-negative integer, number of chromosomes evaluated
+                   by the fitness function
+    '''
+
+    def __init__(self, max_entries=1 << 16):
+        '''
+        Inputs:
+
+        max_entries -- positive integer (default is 2 ** 16), maximum number
+                       of stored fitness values
+        '''
+
+        self.max_entries = max_entries
+
+        self.requests = 0
+        self.duplicates = 0
+        self.hits = 0
+        self.evaluations = 0
+
+        self._values = OrderedDict()
+
+    def __len__(self):
+        return len(self._values)
+
+    def evaluate(self, fit_func, population, fit_args, packed=False):
+        '''
+        Inputs:
+
+        fit_func -- fitness function, the same as in run function
+
+        population -- nested (2D) numpy array, chromosomes (boolean or packed)
+
+        fit_args -- list or tuple, additional argument(s) of the fitness function
+
+        packed -- boolean (default is False), if chromosomes are packed into 64-bit words
+
+
+        Only distinct chromosomes that are not in the cache are passed
+        to the fitness function, in a single call.
+
+
+        Returns 1D numpy array of real numbers, a fitness value for each chromosome.
+        '''
+
+        words = population if packed else pack(population)
+
+        # Each chromosome as a single opaque value, so rows can be compared at once
+        rows = np.ascontiguousarray(words).view(np.dtype((np.void, words.shape[1] * 8))).ravel()
+
+        distinct, first, inverse = np.unique(rows, return_index=True, return_inverse=True)
+
+        keys = [row.tobytes() for row in distinct]
+        values = np.empty(shape=distinct.size, dtype=np.float64)
+        missing = []
+
+        for k, key in enumerate(keys):
+
+            value = self._values.get(key)
+
+            if value is None:
+                missing.append(k)
+            else:
+                self._values.move_to_end(key)
+                values[k] = value
+
+        if missing:
+
+            values[missing] = fit_func(population[first[missing]], *fit_args)
+
+            for k in missing:
+                self._values[keys[k]] = values[k]
+
+            # Remove the least recently used values
+            while len(self._values) > self.max_entries:
+                self._values.popitem(last=False)
+
+        self.requests += rows.size
+        self.duplicates += rows.size - distinct.size
+        self.hits += distinct.size - len(missing)
+        self.evaluations += len(missing)
+
+        return values[inverse.ravel()]
+
+    def stats(self):
+        '''
+        Returns a dictionary with counters (the same as attributes) and:
+        -- hit_rate -- fraction of chromosomes not passed to the fitness function
+           (found in the cache or duplicated within a generation);
+        -- saved -- number of evaluations saved.
+        '''
+
+        saved = self.requests - self.evaluations
+
+        return {
+            'requests': self.requests,
+            'duplicates': self.duplicates,
+            'hits': self.hits,
+            'evaluations': self.evaluations,
+            'saved': saved,
+            'hit_rate': saved / self.requests if self.requests else 0.0
+        }
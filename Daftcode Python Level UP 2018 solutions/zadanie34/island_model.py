@@ -0,0 +1,388 @@
+#!/usr/bin/python3
+
+'''Island model of the binary genetic algorithm engine'''
+
+
+from collections import namedtuple
+from multiprocessing import Barrier, Pool, Value
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from zadanie34.binary_genetic_algorithm import (GAOptions, breed, count_survivors, evaluate,
+                                                generate, survive)
+from zadanie34.chromosome_packing import generate_packed, unpack
+
+
+# Topologies of migration between islands:
+# -- ring -- each island receives migrants from the previous one;
+# -- full -- each island receives migrants from all other islands.
+TOPOLOGIES = ('ring', 'full')
+
+# Options of run_islands function, fields of GAOptions and:
+# -- nislands -- positive integer, number of islands (worker processes);
+# -- interval -- positive integer, number of generations between migrations;
+# -- migrants -- positive integer, number of chromosomes sent by each island;
+# -- topology -- string, one of TOPOLOGIES;
+# -- seed -- non-negative integer or None, seed of random data.
+IslandOptions = namedtuple('IslandOptions',
+                           GAOptions._fields + ('nislands', 'interval', 'migrants',
+                                                'topology', 'seed'),
+                           defaults=GAOptions() + (4, 10, 2, 'ring', None))
+
+# Shared data of a worker process of run_islands, set by attach_island
+island_state = {}
+
+
+def migration_sources(island, nislands, topology):
+    '''
+    Inputs:
+
+    island -- non-negative integer, index of an island
+
+    nislands -- positive integer, number of islands
+
+    topology -- string, one of TOPOLOGIES
+
+
+    Returns a list of indexes of islands that send migrants to a given island.
+    '''
+
+    if topology == 'ring':
+        return [(island - 1) % nislands]
+
+    return [k for k in range(nislands) if k != island]
+
+
+def attach_island(name, ncols, barrier, done, settings):
+    '''
+    Inputs:
+
+    name -- string, name of a shared memory block with migrants
+
+    ncols -- positive integer, number of columns of a population array
+
+    barrier -- multiprocessing.Barrier shared by all islands
+
+    done -- shared boolean, set when any island reaches the fitness threshold
+
+    settings -- dictionary, arguments of run_islands function shared by all islands
+
+
+    Initializer of worker processes, maps shared buffers of migrants
+    (their fitness values first, then chromosomes) without copying them.
+
+
+    This function does not return any value.
+    '''
+
+    block = SharedMemory(name=name)
+
+    options = settings['options']
+    nislands, migrants = options.nislands, options.migrants
+
+    island_state.update(
+        settings,
+        block=block,  # keeps the memory mapped as long as the worker lives
+        scores=np.ndarray(shape=(nislands, migrants), dtype=np.float64, buffer=block.buf),
+        chromosomes=np.ndarray(shape=(nislands, migrants, ncols),
+                               dtype=np.uint64 if options.packed else np.bool_,
+                               buffer=block.buf, offset=8 * nislands * migrants),
+        barrier=barrier,
+        done=done
+    )
+
+
+def evolve_interval(population, scores, alpha, ngen):
+    '''
+    Inputs:
+
+    population, scores -- the current generation of an island and its fitness values
+
+    alpha -- tuple, the best chromosome found so far and its fitness value
+
+    ngen -- non-negative integer, maximum number of generations
+
+
+    Evolves a population of an island in isolation, the same way
+    as run function, until the fitness threshold is reached.
+
+
+    Returns a tuple with four elements: the last generation, its fitness
+    values, the best chromosome with its fitness value (a tuple)
+    and the number of evolved generations.
+    '''
+
+    state = island_state
+    options = state['options']
+
+    nsurvivors = count_survivors(state['pop_size'], options)
+
+    indexes = np.arange(state['pop_size'], dtype=np.uint)
+    bits = np.arange(state['chrom_length'], dtype=np.uint)
+
+    for generation in range(ngen):
+
+        if alpha[1] >= state['threshold']:
+            return population, scores, alpha, generation
+
+        offspring = breed(population, scores, indexes, bits,
+                          state['crs_prob'], state['mut_prob'], options.packed)
+        offspring = offspring[nsurvivors:]
+
+        population, scores = survive(population, scores, offspring,
+                                     evaluate(state['fit_func'], offspring,
+                                              state['fit_args'], options))
+
+        best = np.argmax(scores)
+
+        if alpha[1] < scores[best]:
+            alpha = population[best], scores[best]
+
+    return population, scores, alpha, ngen
+
+
+def migrate(island, population, scores, sources):
+    '''
+    Inputs:
+
+    island -- non-negative integer, index of an island
+
+    population, scores -- the current generation of an island and its fitness values
+
+    sources -- list of indexes of islands that send migrants to a given island
+
+
+    All islands meet at a barrier: each island publishes copies of its
+    best chromosomes in shared memory, then replaces its worst chromosomes
+    (in place) with chromosomes published by its sources.
+
+
+    Returns True if any island reached the fitness threshold
+    (chromosomes are not replaced then), False otherwise.
+    '''
+
+    state = island_state
+    migrants = state['options'].migrants
+
+    # Publish the best chromosomes
+    order = np.argsort(scores)
+    best = order[-migrants:]
+
+    state['chromosomes'][island] = population[best]
+    state['scores'][island] = scores[best]
+
+    state['barrier'].wait()
+
+    # Every island reads the flag between the same two barriers
+    if state['done'].value:
+        return True
+
+    # Replace the worst chromosomes with migrants
+    worst = order[:len(sources) * migrants]
+
+    population[worst] = state['chromosomes'][sources].reshape(worst.size, -1)
+    scores[worst] = state['scores'][sources].ravel()
+
+    state['barrier'].wait()
+
+    return False
+
+
+def evolve_island(island, entropy):
+    '''
+    Inputs:
+
+    island -- non-negative integer, index of an island
+
+    entropy -- 1D numpy uint32 array, seed of the random stream of an island
+
+
+    Evolves a population of a single island, the same way as run function
+    (a fitness cache, if any, is copied to each island).
+    Every interval generations all islands exchange migrants (see migrate
+    function). When any island reaches the fitness threshold, all islands
+    stop at the next migration.
+
+
+    Returns a tuple with three elements:
+    -- the best chromosome of an island (the same as returned by run function);
+    -- its fitness value (real number);
+    -- dictionary with statistics of an island: island index, number
+       of generations, number of evaluated chromosomes, the best
+       and the mean fitness value of the last generation.
+    '''
+
+    state = island_state
+    options, iterations = state['options'], state['iterations']
+
+    np.random.seed(entropy)
+
+    try:
+
+        if options.packed:
+            population = generate_packed(state['pop_size'], state['chrom_length'])
+        else:
+            population = generate(state['pop_size'], state['chrom_length'])
+
+        scores = evaluate(state['fit_func'], population, state['fit_args'], options)
+
+        alpha = population[np.argmax(scores)], scores[np.argmax(scores)]
+
+        sources = migration_sources(island, options.nislands, options.topology)
+
+        generation = 0
+
+        while generation < iterations:
+
+            # Evolve in isolation until the next migration
+            population, scores, alpha, ngen = evolve_interval(
+                population, scores, alpha, min(options.interval, iterations - generation))
+
+            generation += ngen
+
+            if alpha[1] >= state['threshold']:
+                state['done'].value = True
+
+            if migrate(island, population, scores, sources):
+                break
+
+    except BaseException:
+        # Release other islands waiting at the barrier
+        state['barrier'].abort()
+        raise
+
+    nsurvivors = count_survivors(state['pop_size'], options)
+
+    stats = {
+        'island': island,
+        'generations': generation,
+        'evaluations': state['pop_size'] + generation * (state['pop_size'] - nsurvivors),
+        'best_score': float(np.max(scores)),
+        'mean_score': float(np.mean(scores))
+    }
+
+    alpha_chromosome, alpha_score = alpha
+
+    if options.packed:
+        alpha_chromosome = unpack(alpha_chromosome[np.newaxis], state['chrom_length'])[0]
+
+    return alpha_chromosome, float(alpha_score), stats
+
+
+def star_evolve_island(args):
+    '''
+    Inputs:
+
+    args -- tuple, arguments of evolve_island function
+
+
+    Returns output of evolve_island function.
+    '''
+
+    return evolve_island(*args)
+
+
+def run_islands(fit_func,
+                crs_prob,
+                mut_prob,
+                chrom_length,
+                pop_size,
+                iterations,
+                fit_args=None,
+                threshold=1.0,
+                options=IslandOptions()):
+    '''
+    Inputs:
+
+    fit_func, crs_prob, mut_prob, chrom_length, fit_args, threshold
+    -- the same as in run function
+    -- fitness function and its arguments must be picklable
+
+    pop_size
+    -- positive integer number, must be even
+    -- number of chromosomes in a generation of a single island
+
+    iterations
+    -- positive integer number
+    -- maximum number of generations of each island
+
+    options
+    -- IslandOptions named tuple (default is IslandOptions())
+    -- packed, fit_cache, elite and replace_rate are the same as in run function,
+       each island gets its own copy of the fitness cache
+
+    nislands
+    -- positive integer number (default is 4)
+    -- number of islands (subpopulations), each one evolves
+       in its own worker process
+
+    interval
+    -- positive integer number (default is 10)
+    -- number of generations between migrations
+
+    migrants
+    -- positive integer number (default is 2)
+    -- number of the best chromosomes sent by each island
+
+    topology -- string, one of TOPOLOGIES (default is 'ring')
+
+    seed
+    -- non-negative integer or None (default), seed of random data
+    -- each island draws from its own independent stream
+
+
+    Island model: subpopulations evolve independently and exchange
+    their best chromosomes periodically through shared memory,
+    so only migrants are copied between processes. Islands keep
+    the diversity of separate populations, while migration spreads
+    good building blocks between them.
+
+
+    Returns a tuple with two elements:
+    -- a chromosome with the largest fitness value of all islands
+       (1D numpy boolean array);
+    -- list of dictionaries with statistics of each island.
+    '''
+
+    nislands = options.nislands
+
+    assert options.topology in TOPOLOGIES, 'Unknown topology: {}'.format(options.topology)
+    assert len(migration_sources(0, nislands, options.topology)) * options.migrants < pop_size
+
+    settings = {
+        'fit_func': fit_func,
+        'fit_args': [] if fit_args is None else fit_args,
+        'crs_prob': crs_prob,
+        'mut_prob': mut_prob,
+        'chrom_length': chrom_length,
+        'pop_size': pop_size,
+        'iterations': iterations,
+        'threshold': threshold,
+        'options': options
+    }
+
+    ncols = (chrom_length + 63) >> 6 if options.packed else chrom_length
+
+    # Independent random streams of islands
+    streams = np.random.SeedSequence(options.seed).spawn(nislands)
+    argpack = [(k, stream.generate_state(4)) for k, stream in enumerate(streams)]
+
+    # Fitness values (8 bytes each) and chromosomes of migrants of all islands
+    block = SharedMemory(create=True, size=nislands * options.migrants
+                         * (8 + ncols * (8 if options.packed else 1)))
+
+    try:
+
+        # One worker per island, as all of them must meet at a barrier
+        with Pool(processes=nislands, initializer=attach_island,
+                  initargs=(block.name, ncols, Barrier(nislands),
+                            Value('b', False), settings)) as workers:
+
+            results = workers.map(star_evolve_island, argpack, chunksize=1)
+
+    finally:
+        block.close()
+        block.unlink()
+
+    return max(results, key=lambda res: res[1])[0], [stats for _, _, stats in results]
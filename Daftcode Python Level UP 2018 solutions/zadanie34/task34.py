@@ -1,51 +1,74 @@
-from multiprocessing import Pool
-from operator import itemgetter
-
 import numpy as np
 from numba import jit
 
-from zadanie34.binary_genetic_algorithm import run
-from zadanie34.task34_utils import count_lvl_nodes
+from zadanie34.task34_packed import PackedNodes, packed_bottom_up
+from zadanie34.task34_triangle import accepts_triangle
+from zadanie34.task34_utils import accumulator_dtype, count_lvl_nodes, lvl_offset
 
 
 # Terms that are used interchangeably: level/row, path/route, triangle/pyramid.
 # Each path is a sequence of steps from top (first element) to bottom (last element).
 # Each step is a binary decision: 0 for left, 1 for right.
 # Each node is an integer number between 10 and 99.
+# Solvers accept a Triangle object in place of nlvls, max_sum and triangle arguments.
+# Genetic algorithm solvers are in task34_ga module, branch and bound in task34_bnb
+# module, solvers that use multiple processes or threads in task34_parallel module.
 
 
-@jit
-def fitness(population, triangle, prev_lvl_nodes, max_sum):
+def merge_paths(positions, totals):
     '''
     Inputs:
 
-    population -- 2D boolean numpy array, sequence of chromosomes
+    positions -- 1D integer numpy array, positions of nodes reached by paths
 
-    triangle
-    -- 1D unsigned integer numpy array, sequence of leaf nodes
-       arranged from left to right and top to bottom
+    totals -- 1D integer numpy array, sums of paths
 
-    prev_lvl_nodes
-    -- 1D unsigned integer numpy array, total number of leaf nodes
-       in all previous levels
 
-    max_sum
-    -- positive integer, sum of maximum values in each level
-    -- maximum theoretical (not necessarily feasible) sum of path nodes
+    Returns 1D integer numpy array, indexes of a single (the best) path
+    for each node (the left step on ties), in order of nodes.
+    '''
+
+    order = np.lexsort((-totals, positions))
+
+    sorted_positions = positions[order]
 
+    first = np.ones(shape=order.size, dtype=np.bool_)
+    np.not_equal(sorted_positions[1:], sorted_positions[:-1], out=first[1:])
 
-    Returns 1D numpy array of real numbers with a score, between 0 and 1,
-    for each chromosome in population.
+    return order[first]
+
+
+def backtrack_beams(beams, parents, k):
     '''
+    Inputs:
 
-    # Translate path (sequence of steps) to indexes of numbers (visited leaf nodes)
-    indexes = prev_lvl_nodes + np.add.accumulate(population, axis=1, dtype=prev_lvl_nodes.dtype)
+    beams -- list with 1D integer numpy arrays, positions of nodes
+             kept in each level
 
-    return np.sum(triangle[indexes], axis=1, dtype=np.float32) / max_sum
+    parents -- list with 1D integer numpy arrays, indexes of previous
+               nodes of each level (None for the first level)
 
+    k -- non-negative integer, index of the last node of a path
 
-@jit(nopython=False, cache=True, parallel=False)
-def evolutionary_method(nlvls, max_sum, triangle, psize=100, ngen=101, cprob=0.7, mprob=0.05):
+
+    Returns 1D unsigned integer numpy array with ones and zeros,
+    steps of a path, from top to bottom.
+    '''
+
+    best_path = np.empty(shape=len(beams), dtype=np.uint8)
+
+    for lvl in range(len(beams) - 1, 0, -1):
+        parent = parents[lvl][k]
+        best_path[lvl] = beams[lvl][k] - beams[lvl-1][parent]
+        k = parent
+
+    best_path[0] = beams[0][k]
+
+    return best_path
+
+
+@accepts_triangle
+def beam_search(nlvls, max_sum, triangle, width=64):
     '''
     Inputs:
 
@@ -56,57 +79,72 @@ def evolutionary_method(nlvls, max_sum, triangle, psize=100, ngen=101, cprob=0.7
 
     max_sum
     -- positive integer, sum of maximum values in each level (row)
-    -- maximum theoretical (not necessarily feasible) sum of path nodes
+    -- this parameter is present only to preserve compatibility
 
     triangle
     -- 1D unsigned integer numpy array, sequence of leaf nodes
        arranged from left to right and top to bottom
 
-    psize
-    -- positive integer number (default is 100), must be even
-    -- total number of chromosomes in a generation
-
-    ngen
-    -- positive integer number (default is 101)
-    -- maximum number of generations
+    width
+    -- positive integer (default is 64), number of partial paths kept
+       in each level
+    -- the larger the width, the better the result and the longer
+       the execution time, the result is optimal if the width
+       is greater than the number of levels
 
-    cprob
-    -- positive real number (default is 0.7)
-    -- crossover (recombination) probability
-    -- probability that a pair of chromosomes will exchange
-       part of bit sequences
 
-    mprob
-    -- positive real number (default is 0.05)
-    -- mutation rate
-    -- probability that a bit will be inverted
+    Walks the triangle top-down and keeps only the best partial paths
+    (beam). Each path is extended to both nodes below, paths that reach
+    the same node are merged (the better one survives) and the best
+    ones are selected for the next level. Ties are resolved in favour
+    of nodes on the left, so the result is deterministic.
+    Time complexity is O(nlvls * width * log(width)), memory O(nlvls * width).
 
 
     Returns a tuple with two elements:
-    -- the largest sum of leaf nodes (single positive integer number);
-    -- optimal path (1D unsigned integer numpy array with ones and zeros).
+    -- the largest sum of leaf nodes found (single positive integer number);
+    -- path of that sum (1D unsigned integer numpy array with ones and zeros).
     '''
 
-    # Total number of nodes in previous levels
-    prev_lvl_nodes = count_lvl_nodes(nlvls)[0]
+    # Positions of nodes (sorted) and sums of the best paths leading to them
+    positions = np.arange(2, dtype=np.int64)
+    totals = triangle[:2].astype(np.int64)
+
+    # Positions and indexes of previous nodes of each level, for backtracking
+    beams = [positions]
+    parents = [None]
+
+    for lvl in range(1, nlvls):
+
+        n = lvl_offset(lvl)
+        nbeam = positions.size
+
+        # Both steps from each node, left steps first
+        cand_positions = np.concatenate((positions, positions + 1))
+        cand_parents = np.concatenate((np.arange(nbeam), np.arange(nbeam)))
+        cand_totals = np.concatenate((totals, totals)) + triangle[n + cand_positions]
 
-    best_path = run(
-        fit_func=fitness,
-        crs_prob=cprob,
-        mut_prob=mprob,
-        chrom_length=nlvls,
-        pop_size=psize,
-        iterations=ngen,
-        fit_args=(triangle, prev_lvl_nodes, max_sum),
-        threshold=1.0
-    )
+        # A single (the best) path for each node, in order of nodes
+        order = merge_paths(cand_positions, cand_totals)
 
-    indexes = prev_lvl_nodes + np.add.accumulate(best_path, dtype=prev_lvl_nodes.dtype)
+        if order.size > width:
+            # The best paths (nodes on the left first), kept in order of nodes
+            best = np.lexsort((np.arange(order.size), -cand_totals[order]))[:width]
+            order = order[np.sort(best)]
 
-    return np.sum(triangle[indexes]), best_path.astype(np.uint8)
+        positions = cand_positions[order]
+        totals = cand_totals[order]
 
+        beams.append(positions)
+        parents.append(cand_parents[order])
 
-@jit
+    k = int(np.argmax(totals))
+
+    return int(totals[k]), backtrack_beams(beams, parents, k)
+
+
+@accepts_triangle
+@jit(nopython=True, cache=True)
 def brute_force(nlvls, max_sum, triangle, start, stop):
     '''
     Inputs:
@@ -140,28 +178,25 @@ def brute_force(nlvls, max_sum, triangle, start, stop):
 
     assert start < stop
 
-    # Total number of nodes in previous levels
-    prev_lvl_nodes = count_lvl_nodes(nlvls)[0]
-
-    # Template for converting an integer to a binary string
-    template = '{:0{:d}b}'
-
     grand_total = 0
     best_path = np.zeros(shape=nlvls, dtype=np.uint8)
+    steps = np.empty(shape=nlvls, dtype=np.uint8)
 
     for num in range(start, stop):
 
-        # Convert number to steps made in current path
-        steps = np.fromiter(template.format(num, nlvls), dtype=best_path.dtype)
+        total = 0
+        pos = 0
 
-        # Translate steps to indexes of numbers (visited leaf nodes)
-        indexes = prev_lvl_nodes + np.add.accumulate(steps)
-
-        total = np.sum(triangle[indexes])
+        # Convert number to steps made in current path (the highest bit is the first step)
+        # and add visited leaf nodes
+        for lvl in range(nlvls):
+            steps[lvl] = (num >> (nlvls - 1 - lvl)) & 1
+            pos += steps[lvl]
+            total += triangle[lvl_offset(lvl) + pos]
 
         if grand_total < total:
             grand_total = total
-            best_path = steps
+            best_path[:] = steps
 
             if grand_total == max_sum:
                 break
@@ -169,12 +204,148 @@ def brute_force(nlvls, max_sum, triangle, start, stop):
     return grand_total, best_path
 
 
-def parallel_brute_force(nlvls, max_sum, triangle, nproc):
+@jit(nopython=True, cache=True)
+def code_steps(code, nlvls):
+    '''
+    Inputs:
+
+    code -- non-negative integer, path number (the highest bit is the first step)
+
+    nlvls -- positive integer, number of steps
+
+
+    Returns 1D unsigned integer numpy array with ones and zeros, steps of the path.
+    '''
+
+    steps = np.empty(shape=nlvls, dtype=np.uint8)
+
+    for lvl in range(nlvls):
+        steps[lvl] = (code >> (nlvls - 1 - lvl)) & 1
+
+    return steps
+
+
+@jit(nopython=True, cache=True)
+def suffix_sums(nlvls, triangle, block):
+    '''
+    Inputs:
+
+    nlvls -- positive integer, number of levels
+
+    triangle -- 1D unsigned integer numpy array, sequence of leaf nodes
+
+    block -- non-negative integer, less than nlvls, number of the last levels
+
+
+    A bit matrix with the number of right steps made by each suffix
+    (the last block steps of a path) up to each level gives positions
+    of visited nodes relative to the last node of a prefix, the same
+    for all prefixes. Sums of all suffixes are calculated once
+    for every position where a prefix can end.
+
+
+    Returns 2D integer numpy array, sums of nodes visited by each suffix
+    (columns, suffix number with the highest bit as the first step)
+    starting below each node of the last level of prefixes (rows).
+    '''
+
+    height = nlvls - block
+
+    steps = np.zeros(shape=(1 << block, block), dtype=np.int64)
+
+    for code in range(1 << block):
+        for j in range(block):
+            steps[code, j] = ((code >> (block - 1 - j)) & 1) + (steps[code, j-1] if j else 0)
+
+    sums = np.zeros(shape=(height + 1, 1 << block), dtype=np.int64)
+
+    for pos in range(height + 1):
+        for code in range(1 << block):
+            for j in range(block):
+                sums[pos, code] += triangle[lvl_offset(height + j) + pos + steps[code, j]]
+
+    return sums
+
+
+@jit(nopython=True, cache=True)
+def best_suffix(sums, pos, first, last, block):
+    '''
+    Inputs:
+
+    sums -- 2D integer numpy array, sums of suffixes (suffix_sums output)
+
+    pos -- non-negative integer, position where a prefix ends (row of sums)
+
+    first, last -- non-negative integers, range of Gray code positions
+                   of paths with the same prefix (last is exclusive)
+
+    block -- non-negative integer, number of steps of a suffix
+
+
+    Returns a tuple with two elements:
+    -- the suffix with the largest sum among suffixes of paths in a given
+       range, all of them for a whole block (single non-negative integer);
+    -- sum of its nodes (single integer).
+    '''
+
+    if last - first == 1 << block:
+        best = np.argmax(sums[pos])
+        return best, sums[pos, best]
+
+    mask = (1 << block) - 1
+    best = (first ^ (first >> 1)) & mask
+
+    for num in range(first + 1, last):
+        code = (num ^ (num >> 1)) & mask
+        if sums[pos, best] < sums[pos, code]:
+            best = code
+
+    return best, sums[pos, best]
+
+
+# Inlined, otherwise a call for every visited path doubles the time
+@jit(nopython=True, cache=True, inline='always')
+def flip_step(lvl, nlvls, triangle, steps, positions):
+    '''
+    Inputs:
+
+    lvl -- non-negative integer, level of a changed step
+
+    nlvls -- positive integer, number of levels of a path
+
+    triangle -- 1D unsigned integer numpy array, sequence of leaf nodes
+
+    steps, positions -- 1D integer numpy arrays, steps of a path and indices
+                        of visited nodes in each level, modified in place
+
+
+    Changed step moves all nodes below by one position.
+
+
+    Returns an integer, change of the sum of visited nodes.
+    '''
+
+    shift = 1 - 2 * steps[lvl]
+    steps[lvl] ^= 1
+
+    change = 0
+
+    for i in range(lvl, nlvls):
+        change -= triangle[positions[i]]
+        positions[i] += shift
+        change += triangle[positions[i]]
+
+    return change
+
+
+@accepts_triangle
+@jit(nopython=True, cache=True)
+def gray_code_brute_force(nlvls, max_sum, triangle, start, stop, block=0):
     '''
     Inputs:
 
     nlvls
-    -- positive integer, number of levels
+    -- positive integer, number of levels, less than 63
     -- number of binary steps in a single path
     -- number of bits required to represent a single path
 
@@ -186,7 +357,33 @@ def parallel_brute_force(nlvls, max_sum, triangle, nproc):
     -- 1D unsigned integer numpy array, sequence of leaf nodes
        arranged from left to right and top to bottom
 
-    nproc -- positive integer, number of worker processes
+    start
+    -- non-negative integer, lower bound for positions in Gray code order
+    -- start of interval is inclusive
+
+    stop
+    -- postive integer, upper bound for positions in Gray code order
+    -- end of interval is exclusive
+
+    block
+    -- non-negative integer, less than nlvls (default is 0)
+    -- number of the last levels evaluated as blocks of paths
+    -- tables of 2 ** block suffixes are calculated once for each call,
+       so a block should be much smaller than log2(stop - start)
+
+
+    Paths are visited in Gray code order (path number k ^ (k >> 1)
+    for k-th position), so two consecutive paths differ in a single step.
+    The lowest bit corresponds to the last step, so most of the time only
+    a few nodes at the bottom are replaced and the sum is updated
+    instead of being recalculated (amortized constant time per path).
+
+    2 ** block consecutive positions share the steps of the upper levels
+    (a prefix) and visit all suffixes, so such a block of paths
+    is evaluated at once: the sum of its best path is the sum of
+    the prefix and the best sum in a table of suffixes (see suffix_sums
+    function) for the position where the prefix ends. Only prefixes
+    are visited in Gray code order.
 
 
     Returns a tuple with two elements:
@@ -194,25 +391,145 @@ def parallel_brute_force(nlvls, max_sum, triangle, nproc):
     -- optimal path (1D unsigned integer numpy array with ones and zeros).
     '''
 
-    # Total number of possible paths
-    npaths = 1 << nlvls  # 2 ** nlvls
+    assert start < stop and nlvls < 63 and block < nlvls
 
-    limits = np.linspace(start=0, stop=npaths, num=nproc+1, endpoint=True, dtype=np.uint32)
+    # Number of levels of prefixes
+    height = nlvls - block
 
-    partitions = zip(limits[:-1], limits[1:])
+    sums = suffix_sums(nlvls, triangle, block)
 
-    argpack = tuple((nlvls, max_sum, triangle, start, stop) for start, stop in partitions)
+    # Steps and indices of visited nodes in each level for the first prefix
+    num = start >> block
+    steps = code_steps(num ^ (num >> 1), height).astype(np.int64)
+    positions = np.cumsum(steps) + np.arange(height) * (np.arange(height) + 3) // 2
 
-    with Pool(processes=nproc) as workers:
+    prefix = np.sum(triangle[positions].astype(np.int64))
 
-        results = [workers.apply_async(func=brute_force, args=task) for task in argpack]
+    grand_total = -1
+    best_code = 0
+    suffix, total = 0, 0
 
-        grand_total, best_path = max([res.get() for res in results], key=itemgetter(0))
+    while True:
+
+        # Position of the last node of a prefix is a row of suffix sums
+        if block:
+            suffix, total = best_suffix(sums, positions[height-1] - lvl_offset(height - 1),
+                                        max(start, num << block),
+                                        min(stop, (num + 1) << block), block)
+
+        if grand_total < prefix + total:
+            grand_total = prefix + total
+            best_code = ((num ^ (num >> 1)) << block) | suffix
+
+        num += 1
+
+        if num << block >= stop or grand_total == max_sum:
+            break
+
+        # Index of a changed bit is the number of trailing zeros
+        lvl = height - 1
+
+        while not num >> (height - 1 - lvl) & 1:
+            lvl -= 1
+
+        prefix += flip_step(lvl, height, triangle, steps, positions)
+
+    return grand_total, code_steps(best_code, nlvls)
+
+
+@jit(nopython=True, cache=True)
+def bottom_up_decisions(nlvls, triangle, dtype):
+    '''
+    Inputs:
+
+    nlvls
+    -- positive integer, number of levels
+    -- number of binary steps in a single path
+    -- number of bits required to represent a single path
+
+    triangle
+    -- 1D unsigned integer numpy array, sequence of leaf nodes
+       arranged from left to right and top to bottom
+
+    dtype
+    -- numpy unsigned integer data type of totals
+    -- output of accumulator_dtype function
+
+
+    Each node gets a single decision bit, stored at the same position
+    as the node in the flat triangle: 1 if the best route goes to the right
+    node below, 0 if it goes to the left one (nodes in the last level
+    always have 0).
 
-    return grand_total, best_path
 
+    Returns a tuple with two elements:
+    -- the largest sums of paths starting in each node of the first level
+       (1D unsigned integer numpy array with two elements);
+    -- decision bits packed into 1D numpy array of bytes (LSB first).
+    '''
+
+    nnodes = lvl_offset(nlvls)
+
+    decisions = np.zeros(shape=(nnodes + 7) >> 3, dtype=np.uint8)
+
+    # Initialize totals with nodes from the last row and insure that a range
+    # of a data type is enough to handle this values (prevent oveflow)
+    totals = triangle[lvl_offset(nlvls-1):nnodes].astype(dtype)
+
+    for lvl in range(nlvls - 2, -1, -1):
+
+        n = lvl_offset(lvl)
+
+        # Update totals from left to right, so a single buffer is enough
+        for i in range(lvl + 2):
+
+            k = n + i
+
+            # Choose a route (right if True, left if False) and add it to a node above
+            if totals[i+1] > totals[i]:
+                decisions[k >> 3] |= np.uint8(1 << (k & 7))
+                totals[i] = totals[i+1] + triangle[k]
+            else:
+                totals[i] = totals[i] + triangle[k]
+
+    return totals[:2], decisions
+
+
+@jit(nopython=True, cache=True)
+def backtrack(nlvls, first_step, decisions):
+    '''
+    Inputs:
+
+    nlvls
+    -- positive integer, number of levels
+    -- number of binary steps in a single path
+
+    first_step -- integer, 0 or 1, step to the first level
 
-@jit
+    decisions
+    -- 1D numpy array of bytes, packed decision bits
+    -- output of bottom_up_decisions function
+
+
+    Returns 1D unsigned integer numpy array with ones and zeros,
+    steps made in the highest sum path, from top to bottom.
+    '''
+
+    best_path = np.empty(shape=nlvls, dtype=np.uint8)
+    best_path[0] = first_step
+
+    # Position of a visited node in its level
+    pos = first_step
+
+    for lvl in range(nlvls - 1):
+        k = lvl_offset(lvl) + pos
+        best_path[lvl+1] = (decisions[k >> 3] >> (k & 7)) & 1
+        pos += best_path[lvl+1]
+
+    return best_path
+
+
+@accepts_triangle
 def bottom_up_method(nlvls, max_sum, triangle):
     '''
     Inputs:
@@ -232,52 +549,95 @@ def bottom_up_method(nlvls, max_sum, triangle):
        arranged from left to right and top to bottom
 
 
+    Routes are tracked with one decision bit per node (about nnodes / 8
+    bytes in total) and the best path is recovered by backtracking.
+    Totals use the narrowest data type that cannot overflow.
+
+
     Returns a tuple with two elements:
     -- the largest sum of leaf nodes (single positive integer number);
     -- optimal path (1D unsigned integer numpy array with ones and zeros).
     '''
 
-    # Indexes of first element in rows and number of elements in each row
-    start, stop = count_lvl_nodes(nlvls)
+    dtype = accumulator_dtype(nlvls, triangle.dtype)
 
-    # Indexes of the first and last elements in each row, starting from the bottom row
-    start = start[::-1]
-    stop = stop[::-1] + start
+    totals, decisions = bottom_up_decisions(nlvls, triangle, dtype)
 
-    n = start[0]
-    m = stop[0]
+    m = int(totals[1] > totals[0])
 
-    # Initialize totals with nodes from the last row and insure that a range
-    # of a data type is enough to handle this values (prevent oveflow)
-    totals = triangle[n:m].astype(np.uint32)
+    return int(totals[m]), backtrack(nlvls, m, decisions)
 
-    steps = np.empty(shape=m-n, dtype=np.unicode_)
 
-    for n, m in zip(start[1:], stop[1:]):
+@accepts_triangle(fields=('nlvls', 'nodes'))
+def simple_bottom_up(nlvls, triangle):
+    '''
+    Inputs:
 
-        left = totals[:-1]
-        right = totals[1:]
+    nlvls
+    -- positive integer, number of levels
+    -- number of binary steps in a single path
+    -- number of bits required to represent a single path
 
-        side = right > left  # right if True, left if False
+    triangle
+    -- 1D unsigned integer numpy array, sequence of leaf nodes
+       arranged from left to right and top to bottom
+    -- or PackedNodes object, nodes are unpacked row by row
 
-        # Choose a route (left or right node) and add it to a node above
-        totals = np.where(side, right, left) + triangle[n:m]
 
-        steps = np.core.defchararray.add(
-            np.where(side, steps[1:], steps[:-1]),
-            side.astype(np.uint8).astype(steps.dtype)
-        )
+    Returns a positive integer number, the largest sum of leaf nodes.
+    '''
 
-    m = int(totals[1] > totals[0])
+    if isinstance(triangle, PackedNodes):
+        return packed_bottom_up(nlvls, triangle.words, triangle.bits,
+                                accumulator_dtype(nlvls, triangle.dtype))
+
+    return inplace_bottom_up(nlvls, triangle, accumulator_dtype(nlvls, triangle.dtype))
 
-    # Steps made in the highest sum path, from top to bottom
-    best_path = str(m) + steps[m][::-1]
 
-    return totals[m], np.fromiter(best_path, dtype=np.uint8)
+@jit(nopython=True, cache=True)
+def inplace_bottom_up(nlvls, triangle, dtype):
+    '''
+    Inputs:
 
+    nlvls -- positive integer, number of levels
 
-@jit
-def simple_bottom_up(nlvls, triangle):
+    triangle -- 1D unsigned integer numpy array, sequence of leaf nodes
+
+    dtype
+    -- numpy unsigned integer data type of totals
+    -- output of accumulator_dtype function
+
+
+    Kernel of simple_bottom_up function. Offsets of levels are calculated
+    in closed form and totals are updated in place from left to right,
+    so a single buffer of nlvls + 1 elements is the only allocation.
+    Levels are accessed through slices (views, not copies), which lets
+    the compiler vectorize the inner loop.
+
+
+    Returns a positive integer number, the largest sum of leaf nodes.
+    '''
+
+    n = lvl_offset(nlvls - 1)
+
+    # Initialize totals with nodes from the last row
+    totals = np.empty(shape=nlvls + 1, dtype=dtype)
+    totals[:] = triangle[n:n+nlvls+1]
+
+    for lvl in range(nlvls - 2, -1, -1):
+
+        n = lvl_offset(lvl)
+        row = triangle[n:n+lvl+2]
+
+        # Choose a route (left or right node) and add it to a node above
+        for i in range(lvl + 2):
+            totals[i] = max(totals[i], totals[i+1]) + row[i]
+
+    return max(totals[0], totals[1])
+
+
+@accepts_triangle(fields=('nlvls', 'nodes'))
+def vectorized_bottom_up(nlvls, triangle):
     '''
     Inputs:
 
@@ -291,12 +651,18 @@ def simple_bottom_up(nlvls, triangle):
        arranged from left to right and top to bottom
 
 
+    Level-by-level numpy implementation, allocates new arrays for each level.
+    It is kept as a reference for benchmarks of simple_bottom_up function.
+
+
     Returns a positive integer number, the largest sum of leaf nodes.
     '''
 
     # Indexes of first element in rows and number of elements in each row
     start, stop = count_lvl_nodes(nlvls)
 
+    dtype = accumulator_dtype(nlvls, triangle.dtype)
+
     # Indexes of the first and last elements in each row, starting from the bottom row
     start = start[::-1]
     stop = stop[::-1] + start
@@ -306,7 +672,7 @@ def simple_bottom_up(nlvls, triangle):
 
     # Initialize totals with nodes from the last row and insure that a range
     # of a data type is enough to handle this values (prevent oveflow)
-    lvl = triangle[n:m].astype(np.uint32)
+    lvl = triangle[n:m].astype(dtype)
 
     for n, m in zip(start[1:], stop[1:]):
 
@@ -314,3 +680,320 @@ def simple_bottom_up(nlvls, triangle):
         lvl = np.fmax(lvl[:-1], lvl[1:]) + triangle[n:m]
 
     return np.amax(lvl)
+
+
+@jit(nopython=True, cache=True)
+def dp_table(nlvls, triangle, dtype):
+    '''
+    Inputs:
+
+    nlvls
+    -- positive integer, number of levels
+    -- number of binary steps in a single path
+    -- number of bits required to represent a single path
+
+    triangle
+    -- 1D unsigned integer numpy array, sequence of leaf nodes
+       arranged from left to right and top to bottom
+
+    dtype
+    -- numpy unsigned integer data type of the table
+    -- output of accumulator_dtype function
+
+
+    Returns 1D unsigned integer numpy array of the same size as the triangle
+    with the largest sum of a path starting in each node (bottom-up totals).
+    '''
+
+    table = np.empty(shape=lvl_offset(nlvls), dtype=dtype)
+
+    fill_dp_table(nlvls, triangle, table)
+
+    return table
+
+
+@jit(nopython=True, cache=True)
+def fill_dp_table(nlvls, triangle, table):
+    '''
+    Inputs:
+
+    nlvls -- positive integer, number of levels
+
+    triangle -- 1D unsigned integer numpy array, sequence of leaf nodes
+
+    table
+    -- 1D unsigned integer numpy array (or numpy.memmap), modified in place
+    -- must have the same size as the triangle and a data type
+       at least as wide as the output of accumulator_dtype function
+
+
+    Writes bottom-up totals into a given array, so the table can be stored
+    directly in a memory-mapped file.
+
+
+    This function does not return any value.
+    '''
+
+    nnodes = lvl_offset(nlvls)
+
+    n = lvl_offset(nlvls-1)
+    table[n:nnodes] = triangle[n:nnodes]
+
+    for lvl in range(nlvls - 2, -1, -1):
+
+        m = n
+        n = lvl_offset(lvl)
+
+        # Levels are accessed through views, so the loop can be vectorized
+        below = table[m:m+lvl+3]
+        row = triangle[n:n+lvl+2]
+        totals = table[n:n+lvl+2]
+
+        for i in range(lvl + 2):
+            totals[i] = max(below[i], below[i+1]) + row[i]
+
+
+@jit(nopython=True, cache=True)
+def propagate(nlvls, triangle, table, lvl, lo, hi):
+    '''
+    Inputs:
+
+    nlvls -- positive integer, number of levels
+
+    triangle -- 1D unsigned integer numpy array, sequence of leaf nodes
+
+    table
+    -- 1D unsigned integer numpy array, modified in place
+    -- bottom-up totals (output of dp_table function)
+
+    lvl -- non-negative integer, index of a level with changed nodes
+
+    lo, hi -- non-negative integers, range of changed nodes (inclusive)
+
+
+    Recalculates totals of changed nodes and of all nodes above them
+    that may depend on them (the cone of ancestors), level by level,
+    and stops as soon as no total in a level has changed.
+
+
+    Returns a positive integer, number of recalculated totals.
+    '''
+
+    count = 0
+
+    while lvl >= 0:
+
+        n = lvl_offset(lvl)
+        m = lvl_offset(lvl + 1)
+
+        first = -1
+        last = -1
+
+        for i in range(lo, hi + 1):
+
+            total = triangle[n+i]
+
+            if lvl < nlvls - 1:
+                total += max(table[m+i], table[m+i+1])
+
+            if table[n+i] != total:
+                table[n+i] = total
+                last = i
+                if first < 0:
+                    first = i
+
+        count += hi - lo + 1
+
+        if first < 0:
+            break
+
+        # Parents of nodes i and i+1 in a level above are nodes i-1 and i
+        lo = max(first - 1, 0)
+        hi = min(last, lvl)
+        lvl -= 1
+
+    return count
+
+
+def batch_bottom_up(nlvls, triangles, paths=False):
+    '''
+    Inputs:
+
+    nlvls
+    -- positive integer, number of levels
+    -- number of binary steps in a single path
+    -- number of bits required to represent a single path
+
+    triangles
+    -- 2D unsigned integer numpy array
+    -- each row is a sequence of leaf nodes arranged from left to right
+       and top to bottom, all triangles have the same number of levels
+    -- triangles with different number of levels can be combined
+       with stack_triangles function
+
+    paths
+    -- boolean (default is False)
+    -- if True, optimal paths are also found
+
+
+    Solves all triangles at once, each level is processed
+    with a single vectorized operation for the whole batch.
+
+
+    Returns 1D unsigned integer numpy array with the largest sum of leaf nodes
+    for each triangle, or a tuple with two elements if paths are requested:
+    -- the largest sums of leaf nodes (1D unsigned integer numpy array);
+    -- optimal paths (2D unsigned integer numpy array with ones and zeros,
+       one row for each triangle).
+    '''
+
+    batch = np.arange(triangles.shape[0])
+
+    # Initialize totals with nodes from the last row and insure that a range
+    # of a data type is enough to handle this values (prevent oveflow)
+    dtype = accumulator_dtype(nlvls, triangles.dtype)
+
+    totals = triangles[:, lvl_offset(nlvls-1):lvl_offset(nlvls)].astype(dtype)
+
+    if paths:
+        # Decision bits (right if True, left if False) for each node
+        sides = np.zeros(shape=triangles.shape, dtype=np.bool_)
+
+    for lvl in range(nlvls - 2, -1, -1):
+
+        n = lvl_offset(lvl)
+        m = n + lvl + 2
+
+        left = totals[:, :lvl+2]
+        right = totals[:, 1:lvl+3]
+
+        if paths:
+            np.greater(right, left, out=sides[:, n:m])
+
+        # Choose a route (left or right node) and add it to a node above,
+        # the result overwrites the beginning of totals
+        np.maximum(left, right, out=left)
+        np.add(left, triangles[:, n:m], out=left)
+
+    side = (totals[:, 1] > totals[:, 0]).astype(np.uint8)
+
+    max_sums = totals[batch, side]
+
+    if not paths:
+        return max_sums
+
+    best_paths = np.empty(shape=(batch.size, nlvls), dtype=np.uint8)
+    best_paths[:, 0] = side
+
+    # Position of a visited node in its level
+    pos = side.astype(np.int64)
+
+    for lvl in range(nlvls - 1):
+        best_paths[:, lvl+1] = sides[batch, lvl_offset(lvl) + pos]
+        pos += best_paths[:, lvl+1]
+
+    return max_sums, best_paths
+
+
+@jit(nopython=True, cache=True)
+def extend_frontier(frontier, width, row):
+    '''
+    Inputs:
+
+    frontier
+    -- 1D unsigned integer numpy array, modified in place
+    -- the largest sums of paths ending in each node of the last level,
+       stored in the first width elements
+    -- must have room for at least width + 1 elements
+
+    width
+    -- non-negative integer, number of nodes in the last level
+    -- use 0 to start a new frontier
+
+    row
+    -- 1D unsigned integer numpy array, nodes of the next level
+    -- must contain width + 1 elements (or 2 elements for a new frontier)
+
+
+    Extends the frontier by one level, top-down. Nodes are updated
+    from right to left, so a single buffer is enough.
+
+
+    Returns a positive integer, number of nodes in the new last level.
+    '''
+
+    if width == 0:
+        frontier[0] = row[0]
+        frontier[1] = row[1]
+        return 2
+
+    frontier[width] = frontier[width-1] + row[width]
+
+    for i in range(width - 1, 0, -1):
+        frontier[i] = max(frontier[i-1], frontier[i]) + row[i]
+
+    frontier[0] += row[0]
+
+    return width + 1
+
+
+def stream_top_down(src):
+    '''
+    Inputs:
+
+    src
+    -- string, path to a text file (raw data)
+    -- the same format as expected by process_text function
+
+
+    Reads a text file line by line and keeps only the largest sums
+    of paths ending in each node of the current level, so memory usage
+    is proportional to the number of levels, not to the number of nodes.
+
+
+    Returns a tuple with three elements:
+    -- root node value (positive integer);
+    -- number of levels (non-negative integer);
+    -- the largest sum of leaf nodes (non-negative integer, zero
+       if the file contains only the root node).
+    Returns None if the file cannot be read.
+    '''
+
+    # Unknown number of levels, so use the widest type to prevent overflow
+    frontier = np.zeros(shape=1024, dtype=np.uint64)
+    width = 0
+
+    try:
+
+        with open(file=src, mode='rt') as f:
+
+            root_node = int(f.readline().strip())
+
+            for line in f:
+
+                if line.isspace():
+                    continue
+
+                row = np.fromstring(line, dtype=frontier.dtype, sep=' ')
+
+                assert row.size == width + 1 or (width == 0 and row.size == 2)
+
+                if frontier.size <= width:
+                    frontier = np.concatenate((frontier, np.zeros_like(frontier)))
+
+                width = extend_frontier(frontier, width, row)
+
+    except (IOError, OSError) as err:
+        print('Cannot open:', src)
+        print(err.strerror if err.strerror else err)
+
+    except (AssertionError, ValueError):
+        print('Invalid triangle in:', src)
+
+    else:
+        if width == 0:
+            return root_node, 0, 0
+
+        return root_node, width - 1, int(np.amax(frontier[:width]))
+
+    return None
@@ -0,0 +1,445 @@
+import json
+import platform
+import tracemalloc
+from datetime import datetime
+from os import cpu_count, path
+from timeit import default_timer
+
+import numba
+import numpy as np
+
+from zadanie34.binary_genetic_algorithm import GAOptions
+from zadanie34.task34_generate import planted_path
+from zadanie34.task34_utils import fabricate_data, lvl_offset, row_offsets
+from zadanie34.task34 import (simple_bottom_up, vectorized_bottom_up, bottom_up_method,
+                              beam_search, brute_force)
+from zadanie34.island_model import IslandOptions
+from zadanie34.task34_ga import evolutionary_method, island_method
+from zadanie34.task34_parallel import parallel_brute_force
+
+
+# Each entry: name, function, arguments for given (nlvls, max_sum, triangle),
+# the largest number of levels worth measuring
+SOLVERS = (
+    ('simple_bottom_up', simple_bottom_up, lambda n, s, t: (n, t), 10 ** 4),
+    ('vectorized_bottom_up', vectorized_bottom_up, lambda n, s, t: (n, t), 10 ** 4),
+    ('bottom_up_method', bottom_up_method, lambda n, s, t: (n, s, t), 10 ** 4),
+    ('evolutionary_method', evolutionary_method, lambda n, s, t: (n, s, t, 100, 101), 10 ** 3),
+    ('island_method', island_method,
+     lambda n, s, t: (n, s, t, 100, 101, 0.7, 0.05, IslandOptions(nislands=cpu_count())), 10 ** 3),
+    ('beam_search', beam_search, lambda n, s, t: (n, s, t, 64), 10 ** 4),
+    ('brute_force', brute_force, lambda n, s, t: (n, s, t, 0, 1 << n), 16),
+    ('parallel_brute_force', parallel_brute_force, lambda n, s, t: (n, s, t, cpu_count()), 20)
+)
+
+# Numbers of levels, orders of magnitude
+# (a triangle with 10 ** 5 levels takes about 5 GB, too much for a default run)
+SIZES = (10, 100, 1000, 10000)
+
+# Replacement strategies of the genetic algorithm, each entry:
+# name, fields of GAOptions passed to evolutionary_method function
+STRATEGIES = (
+    ('generational', {}),
+    ('elite 1', {'elite': 1}),
+    ('elite 10', {'elite': 10}),
+    ('steady-state 0.5', {'replace_rate': 0.5}),
+    ('steady-state 0.2', {'replace_rate': 0.2})
+)
+
+
+def measure(fn, args, nrep):
+    '''
+    Input:
+
+    fn -- reference to a function
+
+    args -- tuple, arguments of the function
+
+    nrep -- positive integer, number of measured executions
+
+
+    The first execution (warm-up) is not included in statistics,
+    it triggers JIT compilation for exactly the same argument types
+    as measured executions.
+
+
+    Peak memory usage is measured with tracemalloc module. Numba allocates
+    arrays in nopython mode with the same memory allocator as numpy,
+    so it includes arrays created both by Python code and inside
+    compiled functions, but not arguments allocated before the call.
+
+
+    Returns a dictionary with execution times (warm-up and statistics
+    of measured executions, in seconds) and peak memory usage (in bytes).
+    '''
+
+    warmup = default_timer()
+    fn(*args)
+    warmup = default_timer() - warmup
+
+    times = np.zeros(shape=nrep, dtype=np.float64)
+
+    for i in range(nrep):
+        times[i] = default_timer()
+        fn(*args)
+        times[i] = default_timer() - times[i]
+
+    # Memory is measured in a separate run, tracing slows down execution
+    tracemalloc.start()
+    fn(*args)
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        'warmup': warmup,
+        'min': float(np.amin(times)),
+        'avg': float(np.mean(times)),
+        'med': float(np.median(times)),
+        'max': float(np.amax(times)),
+        'std': float(np.std(times)),
+        'peak_memory': peak_memory
+    }
+
+
+def run_benchmarks(solvers=SOLVERS, sizes=SIZES, nrep=5, seed=0, verbose=True):
+    '''
+    Input:
+
+    solvers
+    -- sequence of tuples, the same structure as SOLVERS (default)
+
+    sizes
+    -- sequence of positive integers, numbers of levels
+    -- default is SIZES
+
+    nrep -- positive integer (default is 5), number of measured executions
+
+    seed -- integer (default is 0), seed of random data
+
+    verbose -- boolean (default is True), each result will be printed if True
+
+
+    Solvers are skipped for triangles larger than their limit.
+    Errors raised by solvers are recorded instead of results.
+
+
+    Returns a dictionary with information about the environment (meta)
+    and a list of results, one dictionary for each solver and size.
+    '''
+
+    results = []
+
+    for nlvls in sizes:
+
+        np.random.seed(seed)
+        max_sum, triangle = fabricate_data(nlvls, True)
+
+        for name, fn, fnargs, max_nlvls in solvers:
+
+            if nlvls > max_nlvls:
+                continue
+
+            record = {'func': name, 'nlvls': nlvls, 'nrep': nrep}
+
+            try:
+                record.update(measure(fn, fnargs(nlvls, max_sum, triangle), nrep))
+            except Exception as err:
+                # Keep only the first line of a message
+                record['error'] = '{}: {}'.format(type(err).__name__, str(err).split('\n')[0])
+
+            results.append(record)
+
+            if verbose:
+                print(format_record(record))
+
+    meta = {
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'numba': numba.__version__,
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'ncpu': cpu_count(),
+        'seed': seed
+    }
+
+    return {'meta': meta, 'results': results}
+
+
+def planted_triangle(nlvls, seed=0):
+    '''
+    Input:
+
+    nlvls -- positive integer, number of levels
+
+    seed -- integer (default is 0), seed of random data
+
+
+    Random nodes between 10 and 99 with a single path of nodes equal
+    to 100 (the same as 'planted' mode of task34_generate module),
+    so the optimal path reaches the sum of maximum values.
+
+
+    Returns a tuple with the sum of maximum values in each level
+    and leaf nodes (1D numpy uint8 array).
+    '''
+
+    rng = np.random.default_rng(seed)
+
+    triangle = rng.integers(low=10, high=100, size=lvl_offset(nlvls), dtype=np.uint8)
+
+    positions = np.add.accumulate(planted_path(nlvls, 'planted', seed), dtype=np.int64)
+    triangle[row_offsets(nlvls) + positions] = 100
+
+    return 100 * nlvls, triangle
+
+
+class EvaluationCounter:
+    '''
+    Counts calls of the fitness function, in place of a fitness cache
+    (the same interface as FitnessCache, but nothing is stored).
+
+    Attributes:
+
+    calls -- list of non-negative integers, number of chromosomes
+             evaluated in each call (the first one is the initial population)
+    '''
+
+    def __init__(self):
+        self.calls = []
+
+    def evaluate(self, fit_func, population, fit_args, packed=False):
+        '''
+        Inputs: the same as in FitnessCache.evaluate method
+
+
+        Returns output of the fitness function.
+        '''
+
+        del packed
+
+        self.calls.append(len(population))
+
+        return fit_func(population, *fit_args)
+
+
+def run_strategy(nlvls, max_sum, triangle, psize, ngen, kwargs, seed):
+    '''
+    Input:
+
+    nlvls, max_sum, triangle -- the same as in evolutionary_method function
+
+    psize, ngen -- positive integers, population size and the maximum
+                   number of generations
+
+    kwargs -- dictionary, fields of GAOptions named tuple
+
+    seed -- integer, seed of random data
+
+
+    Returns a tuple with four elements: the number of generations,
+    the number of evaluated chromosomes, execution time (in seconds)
+    and 1 if the optimal path was found (0 otherwise).
+    '''
+
+    counter = EvaluationCounter()
+    options = GAOptions(fit_cache=counter, **kwargs)
+
+    np.random.seed(seed)
+
+    t = default_timer()
+    total = evolutionary_method(nlvls, max_sum, triangle, psize, ngen, options=options)[0]
+    t = default_timer() - t
+
+    return len(counter.calls) - 1, sum(counter.calls), t, int(total == max_sum)
+
+
+def run_strategies(strategies=STRATEGIES, nlvls=40, psize=100, ngen=1000, nrep=5, seed=0,
+                   verbose=True):
+    '''
+    Input:
+
+    strategies
+    -- sequence of tuples, the same structure as STRATEGIES (default)
+
+    nlvls -- positive integer (default is 40), number of levels
+
+    psize, ngen -- positive integers (default is 100 and 1000), population size
+                   and the maximum number of generations
+
+    nrep -- positive integer (default is 5), number of runs of each strategy
+
+    seed -- integer (default is 0), seed of random data
+
+
+    Each strategy runs evolutionary_method with default crossover and
+    mutation probabilities, on a triangle with a planted optimal path,
+    until the optimal path is found (fitness threshold is 1) or the limit
+    of generations is reached.
+    Runs with the same index use the same random seed for all strategies.
+
+
+    Returns a list of dictionaries, one for each strategy, with medians
+    of the number of generations, the number of evaluated chromosomes
+    and execution time (in seconds), and the fraction of solved runs.
+    '''
+
+    max_sum, triangle = planted_triangle(nlvls, seed)
+
+    results = []
+
+    for name, kwargs in strategies:
+
+        # Generations, evaluations, time and solved (columns) of each run (rows)
+        runs = np.array([run_strategy(nlvls, max_sum, triangle, psize, ngen, kwargs, seed + i)
+                         for i in range(nrep)], dtype=np.float64)
+
+        record = {
+            'strategy': name,
+            'nlvls': nlvls,
+            'nrep': nrep,
+            'solved': float(np.mean(runs[:, 3])),
+            'generations': float(np.median(runs[:, 0])),
+            'evaluations': float(np.median(runs[:, 1])),
+            'time': float(np.median(runs[:, 2]))
+        }
+
+        results.append(record)
+
+        if verbose:
+            print(('{strategy:>22s} {nlvls:>7d}  solved: {solved:5.0%}  '
+                   'generations: {generations:8.1f}  evaluations: {evaluations:10.1f}  '
+                   'time: {time:8.3f}').format(**record))
+
+    return results
+
+
+def format_record(record):
+    '''
+    Input:
+
+    record -- dictionary, single result of run_benchmarks function
+
+
+    Returns a string with a single line summary of the result.
+    '''
+
+    if 'error' in record:
+        return '{func:>22s} {nlvls:>7d}  error: {error}'.format(**record)
+
+    return ('{func:>22s} {nlvls:>7d}  min: {min:10.6f}  avg: {avg:10.6f}  '
+            'warm-up: {warmup:8.3f}  peak memory: {peak_memory:>13,d} B').format(**record)
+
+
+def save_results(benchmark, filepath):
+    '''
+    Input:
+
+    benchmark -- dictionary, output of run_benchmarks function
+
+    filepath -- string, path to a JSON file
+
+
+    This function does not return any value.
+    '''
+
+    with open(file=filepath, mode='wt') as f:
+        json.dump(benchmark, f, indent=2)
+
+
+def load_results(filepath):
+    '''
+    Input:
+
+    filepath -- string, path to a JSON file created by save_results function
+
+
+    Returns a dictionary, the same as run_benchmarks function.
+    '''
+
+    with open(file=filepath, mode='rt') as f:
+        return json.load(f)
+
+
+def compare_results(baseline, current, tolerance=0.25, verbose=True):
+    '''
+    Input:
+
+    baseline, current -- dictionaries, outputs of run_benchmarks function
+
+    tolerance
+    -- non-negative real number (default is 0.25)
+    -- allowed relative increase of the minimum execution time
+       and of the peak memory usage
+
+    verbose -- boolean (default is True), regressions will be printed if True
+
+
+    Only results present in both benchmarks are compared.
+    The minimum execution time is used, as it is the least noisy.
+
+
+    Returns a list of dictionaries, one for each regression, with names
+    of a solver and a measure, number of levels, both values and their ratio.
+    '''
+
+    reference = {(rec['func'], rec['nlvls']): rec for rec in baseline['results']}
+
+    regressions = []
+
+    for rec in current['results']:
+
+        base = reference.get((rec['func'], rec['nlvls']))
+
+        if base is None or 'error' in base:
+            continue
+
+        if 'error' in rec:
+            regressions.append({
+                'func': rec['func'],
+                'nlvls': rec['nlvls'],
+                'measure': 'error',
+                'baseline': None,
+                'current': None,
+                'ratio': float('inf')
+            })
+            continue
+
+        for measure_name in ('min', 'peak_memory'):
+
+            if base[measure_name] == 0:
+                continue
+
+            ratio = rec[measure_name] / base[measure_name]
+
+            if ratio > 1 + tolerance:
+                regressions.append({
+                    'func': rec['func'],
+                    'nlvls': rec['nlvls'],
+                    'measure': measure_name,
+                    'baseline': base[measure_name],
+                    'current': rec[measure_name],
+                    'ratio': ratio
+                })
+
+    if verbose:
+
+        template = '{func:>22s} {nlvls:>7d}  {measure:>11s}  {ratio:6.2f}x'
+
+        print('Number of regressions: {:d}'.format(len(regressions)))
+        print('\n'.join(template.format(**reg) for reg in regressions), end='\n\n')
+
+    return regressions
+
+
+if __name__ == '__main__':
+
+    output_path = path.join(path.dirname(path.abspath(__file__)), 'benchmark.json')
+    baseline_path = path.join(path.dirname(path.abspath(__file__)), 'benchmark_baseline.json')
+
+    bench = run_benchmarks()
+
+    save_results(bench, output_path)
+
+    if path.isfile(baseline_path):
+        compare_results(load_results(baseline_path), bench)
@@ -0,0 +1,190 @@
+import numpy as np
+from numba import jit
+
+from zadanie34.task34_triangle import accepts_triangle
+from zadanie34.task34_utils import lvl_offset
+
+
+@jit(nopython=True, cache=True)
+def coarse_table(nlvls, triangle, block):
+    '''
+    Inputs:
+
+    nlvls
+    -- positive integer, number of levels
+    -- number of binary steps in a single path
+
+    triangle
+    -- 1D unsigned integer numpy array, sequence of leaf nodes
+       arranged from left to right and top to bottom
+
+    block -- positive integer, number of consecutive nodes of a level in a block
+
+
+    Each level is divided into blocks and each block is replaced by
+    its maximum value. A path from any node of block j can only go
+    to blocks j and j+1 in the level below, so bottom-up totals of blocks
+    are upper bounds of the largest sums of paths starting in their nodes.
+    Block of size 1 gives exact bottom-up totals.
+
+
+    Returns 2D integer numpy array with bottom-up totals of blocks,
+    one row for each level and an additional row of zeros at the end.
+    '''
+
+    nblocks = (nlvls + block) // block + 1
+
+    table = np.zeros(shape=(nlvls + 1, nblocks), dtype=np.int64)
+
+    for lvl in range(nlvls - 1, -1, -1):
+
+        n = lvl_offset(lvl)
+
+        for j in range((lvl + 1) // block + 1):
+
+            block_max = 0
+
+            for i in range(j * block, min((j + 1) * block, lvl + 2)):
+                block_max = max(block_max, triangle[n+i])
+
+            table[lvl, j] = block_max + max(table[lvl+1, j], table[lvl+1, j+1])
+
+    return table
+
+
+@jit(nopython=True, cache=True)
+def bnb_search(nlvls, max_sum, triangle, coarse, block):
+    '''
+    Inputs:
+
+    nlvls, max_sum, triangle, block -- the same as in branch_and_bound function
+
+    coarse -- 2D integer numpy array, output of coarse_table function
+
+
+    Depth-first search that visits the better child node first.
+
+
+    Returns a tuple with four elements:
+    -- the largest sum of leaf nodes (single positive integer number);
+    -- optimal path (1D unsigned integer numpy array with ones and zeros);
+    -- number of expanded nodes (positive integer);
+    -- number of pruned nodes (non-negative integer).
+    '''
+
+    positions = np.zeros(shape=nlvls, dtype=np.int64)
+    sums = np.zeros(shape=nlvls, dtype=np.int64)
+    steps = np.zeros(shape=nlvls, dtype=np.uint8)
+    first = np.zeros(shape=nlvls, dtype=np.uint8)
+    tried = np.zeros(shape=nlvls, dtype=np.uint8)
+
+    best_path = np.zeros(shape=nlvls, dtype=np.uint8)
+    grand_total = -1
+
+    # Number of expanded and pruned nodes
+    counts = np.zeros(shape=2, dtype=np.int64)
+
+    lvl = 0
+
+    while lvl >= 0 and grand_total < max_sum:
+
+        if tried[lvl] == 2:
+            lvl -= 1
+            continue
+
+        pos = positions[lvl-1] if lvl > 0 else 0
+        total = sums[lvl-1] if lvl > 0 else 0
+        n = lvl_offset(lvl) + pos
+
+        # Try the child node with a higher value first
+        if tried[lvl] == 0:
+            first[lvl] = triangle[n+1] > triangle[n]
+
+        steps[lvl] = first[lvl] ^ tried[lvl]
+        tried[lvl] += 1
+
+        pos += steps[lvl]
+        total += triangle[n + steps[lvl]]
+        counts[0] += 1
+
+        if lvl + 1 == nlvls:
+
+            if grand_total < total:
+                grand_total = total
+                best_path[:] = steps
+
+            continue
+
+        # Upper bound of the sum of any path through the current node
+        if total + max(coarse[lvl+1, pos // block],
+                       coarse[lvl+1, (pos + 1) // block]) <= grand_total:
+            counts[1] += 1
+            continue
+
+        positions[lvl] = pos
+        sums[lvl] = total
+        lvl += 1
+        tried[lvl] = 0
+
+    return grand_total, best_path, counts[0], counts[1]
+
+
+@accepts_triangle
+def branch_and_bound(nlvls, max_sum, triangle, block=4, stats=False):
+    '''
+    Inputs:
+
+    nlvls
+    -- positive integer, number of levels
+    -- number of binary steps in a single path
+    -- number of bits required to represent a single path
+
+    max_sum
+    -- positive integer, sum of maximum values in each level (row)
+    -- maximum theoretical (not necessarily feasible) sum of path nodes
+
+    triangle
+    -- 1D unsigned integer numpy array, sequence of leaf nodes
+       arranged from left to right and top to bottom
+
+    block
+    -- positive integer (default is 4)
+    -- number of consecutive nodes of a level merged in a coarse pass
+    -- a larger block needs less memory but gives looser bounds,
+       a block larger than the number of levels gives suffix sums
+       of maximum values in each level
+
+    stats
+    -- boolean (default is False)
+    -- if True, statistics of the search are also returned
+
+
+    Exact depth-first search that prunes every partial path whose sum
+    plus an upper bound of the remaining levels cannot beat the best path
+    found so far. Bounds are bottom-up totals of a coarse triangle
+    made of block maxima (see coarse_table function), which are never
+    larger than suffix sums of maximum values in each level.
+
+
+    Returns a tuple with two elements:
+    -- the largest sum of leaf nodes (single positive integer number);
+    -- optimal path (1D unsigned integer numpy array with ones and zeros).
+    If stats is True, the tuple has a third element, a dictionary with
+    the number of expanded nodes, pruned nodes and the pruning rate.
+    '''
+
+    coarse = coarse_table(nlvls, triangle, block)
+
+    grand_total, best_path, expanded, pruned = bnb_search(
+        nlvls, max_sum, triangle, coarse, block)
+
+    if not stats:
+        return grand_total, best_path
+
+    report = {
+        'expanded': int(expanded),
+        'pruned': int(pruned),
+        'pruning_rate': pruned / expanded
+    }
+
+    return grand_total, best_path, report
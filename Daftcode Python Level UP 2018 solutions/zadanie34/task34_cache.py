@@ -0,0 +1,331 @@
+import json
+from hashlib import blake2b
+from os import path, remove, replace, stat
+from tempfile import NamedTemporaryFile
+from timeit import default_timer
+
+import numpy as np
+
+from zadanie34.task34_prep import load_data
+
+
+# Name of a cache file, created in the same folder as prepared data
+CACHE_NAME = 'solve_cache.json'
+
+# Number of bytes hashed at once
+HASH_CHUNK = 1 << 24
+
+
+def content_hash(flat_triangle):
+    '''
+    Inputs:
+
+    flat_triangle -- 1D unsigned integer numpy array (or numpy.memmap)
+
+
+    The hash depends on node values and their data type.
+
+
+    Returns a string, hexadecimal digest of the triangle.
+    '''
+
+    digest = blake2b(digest_size=16)
+    digest.update(flat_triangle.dtype.str.encode())
+
+    data = np.ascontiguousarray(flat_triangle).view(np.uint8)
+
+    for i in range(0, data.size, HASH_CHUNK):
+        digest.update(data[i:i+HASH_CHUNK])
+
+    return digest.hexdigest()
+
+
+class ResultCache:
+    '''
+    Persistent cache of solver results, stored in a JSON file.
+
+    Results are keyed by a content hash of a triangle, a solver name
+    (with its module) and its parameters. Content hashes of prepared data files are also
+    stored (with file size and modification time), so an unchanged file
+    is not hashed again. The least recently used results and hashes
+    are removed when their number exceeds the limit.
+
+    Attributes:
+
+    filepath -- string, path to the cache file
+
+    max_entries -- positive integer, maximum number of stored results
+                   (and, separately, of stored hashes)
+
+    modified -- boolean, if results or hashes were added or used
+                since the cache was loaded
+    '''
+
+    def __init__(self, filepath, max_entries=128):
+        '''
+        Inputs:
+
+        filepath -- string, path to the cache file (JSON)
+
+        max_entries -- positive integer (default is 128), maximum number
+                       of stored results (and hashes)
+        '''
+
+        self.filepath = filepath
+        self.max_entries = max_entries
+        self.modified = False
+
+        self._data = {'clock': 0, 'hashes': {}, 'results': {}}
+
+        try:
+            with open(file=filepath, mode='rt') as f:
+                self._data.update(json.load(f))
+        except (IOError, OSError, ValueError):
+            pass
+
+    def file_hash(self, datapath, flat_triangle):
+        '''
+        Inputs:
+
+        datapath -- string, path to a prepared data file
+
+        flat_triangle -- 1D unsigned integer numpy array loaded from the file
+
+
+        Returns a string, content hash of the triangle.
+        '''
+
+        info = stat(datapath)
+        signature = [info.st_size, info.st_mtime_ns]
+
+        hashes = self._data['hashes']
+
+        # Hashes are kept in order of use, the most recently used last
+        known = hashes.pop(datapath, None)
+
+        if known is not None and known[:2] == signature:
+            hashes[datapath] = known
+            return known[2]
+
+        digest = content_hash(flat_triangle)
+
+        hashes[datapath] = signature + [digest]
+
+        # Remove the least recently used hashes
+        for old in list(hashes)[:-self.max_entries]:
+            del hashes[old]
+
+        self.modified = True
+
+        return digest
+
+    def get(self, key):
+        '''
+        Inputs:
+
+        key -- string, key of a result
+
+
+        Returns a dictionary with a stored result or None if there is no result.
+        '''
+
+        result = self._data['results'].get(key)
+
+        if result is not None:
+            self.modified = True
+            self._data['clock'] += 1
+            result['used'] = self._data['clock']
+
+        return result
+
+    def put(self, key, result):
+        '''
+        Inputs:
+
+        key -- string, key of a result
+
+        result -- dictionary with JSON serializable values
+
+
+        This function does not return any value.
+        '''
+
+        self.modified = True
+
+        self._data['clock'] += 1
+        self._data['results'][key] = dict(result, used=self._data['clock'])
+
+        results = self._data['results']
+
+        # Remove the least recently used results
+        if len(results) > self.max_entries:
+            for old in sorted(results, key=lambda k: results[k]['used'])[:-self.max_entries]:
+                del results[old]
+
+    def save(self):
+        '''
+        Writes the cache to a uniquely named temporary file and replaces
+        the cache file, so the cache file is never partially written,
+        even if a few processes save it at the same time (the last one wins).
+        Nothing is written if no results or hashes were added or used.
+        Exceptions raised while writing the file are not handled.
+
+
+        This function does not return any value.
+        '''
+
+        if not self.modified:
+            return
+
+        f = NamedTemporaryFile(mode='wt', suffix='.tmp', delete=False,
+                               dir=path.dirname(path.abspath(self.filepath)))
+
+        try:
+            with f:
+                json.dump(self._data, f)
+            replace(f.name, self.filepath)
+        except BaseException:
+            remove(f.name)
+            raise
+
+        self.modified = False
+
+
+def result_key(digest, fn, fnargs):
+    '''
+    Inputs:
+
+    digest -- string, content hash of a triangle
+
+    fn -- reference to a solver
+
+    fnargs -- tuple, additional arguments of the solver
+
+
+    Arguments are serialized to JSON (named tuples as lists, numpy scalars
+    as numbers), so equal arguments always give the same key. Objects
+    without a stable representation (e.g. a fitness cache) are rejected,
+    their default representation contains a memory address.
+
+
+    Returns a string, key of a result.
+    Raises TypeError if arguments cannot be serialized.
+    '''
+
+    def to_number(obj):
+        if isinstance(obj, np.generic):
+            return obj.item()
+        raise TypeError('Argument cannot be a part of a cache key: {!r}'.format(obj))
+
+    return '{}:{}.{}:{}'.format(digest, fn.__module__, fn.__qualname__,
+                                json.dumps(fnargs, default=to_number))
+
+
+def run_solver(fn, nlvls, max_sum, flat_triangle, fnargs):
+    '''
+    Inputs:
+
+    fn -- reference to a solver
+
+    nlvls, max_sum, flat_triangle -- output of load_data function
+
+    fnargs -- tuple, additional arguments of the solver
+
+
+    Returns a dictionary with a result to store in the cache:
+    -- the largest sum of leaf nodes (total);
+    -- optimal path (path), list of ones and zeros or None;
+    -- execution time of the solver in seconds (time).
+    '''
+
+    t = default_timer()
+    output = fn(nlvls, max_sum, flat_triangle, *fnargs)
+    t = default_timer() - t
+
+    total, best_path = output[:2] if isinstance(output, tuple) else (output, None)
+
+    return {
+        'total': int(total),
+        'path': None if best_path is None else np.asarray(best_path).tolist(),
+        'time': t
+    }
+
+
+def cached_solve(filepath, fn, *fnargs, max_entries=128):
+    '''
+    Inputs:
+
+    filepath
+    -- string, path to a prepared data file (.tri or .npz)
+    -- output of process_text function
+
+    fn
+    -- reference to a solver
+    -- first three arguments must be: nlvls, max_sum, triangle
+    -- must return the largest sum of leaf nodes, or a tuple with
+       the largest sum and the optimal path
+
+    fnargs
+    -- additional argument(s) required by the solver
+    -- must be JSON serializable (see result_key function)
+
+    max_entries -- positive integer (default is 128), maximum number
+                   of results stored in the cache
+
+
+    The result is taken from the cache if the same solver with the same
+    parameters has already solved a triangle with identical content,
+    otherwise the solver is executed and its result is stored.
+
+
+    Returns a dictionary with:
+    -- root node value (root_node);
+    -- number of levels (nlvls);
+    -- the largest sum of leaf nodes (total);
+    -- optimal path (path), list of ones and zeros or None;
+    -- execution time of the solver in seconds (time);
+    -- information if the result comes from the cache (cached).
+    Returns None if data cannot be loaded.
+    Raises TypeError if additional arguments cannot be serialized.
+    '''
+
+    data = load_data(filepath)
+
+    if data is None:
+        return None
+
+    root_node, nlvls, flat_triangle, max_sum = data
+
+    filepath = path.abspath(filepath)
+
+    cache = ResultCache(path.join(path.dirname(filepath), CACHE_NAME), max_entries)
+
+    key = result_key(cache.file_hash(filepath, flat_triangle), fn, fnargs)
+
+    result = cache.get(key)
+
+    if result is None:
+
+        result = run_solver(fn, nlvls, max_sum, flat_triangle, fnargs)
+
+        cache.put(key, result)
+
+        cached = False
+
+    else:
+        cached = True
+
+    try:
+        cache.save()
+    except (IOError, OSError) as err:
+        print('Cannot save:', cache.filepath)
+        print(err.strerror if err.strerror else err)
+
+    return {
+        'root_node': int(root_node),
+        'nlvls': nlvls,
+        'total': result['total'],
+        'path': result['path'],
+        'time': result['time'],
+        'cached': cached
+    }
@@ -0,0 +1,237 @@
+import numpy as np
+from numba import jit
+
+from zadanie34.binary_genetic_algorithm import GAOptions, run
+from zadanie34.island_model import IslandOptions, run_islands
+from zadanie34.task34_triangle import accepts_triangle
+from zadanie34.task34_utils import row_offsets
+
+
+def fitness(population, triangle, prev_lvl_nodes, max_sum):
+    '''
+    Inputs:
+
+    population -- 2D boolean numpy array, sequence of chromosomes
+
+    triangle
+    -- 1D unsigned integer numpy array, sequence of leaf nodes
+       arranged from left to right and top to bottom
+
+    prev_lvl_nodes
+    -- 1D unsigned integer numpy array, total number of leaf nodes
+       in all previous levels
+
+    max_sum
+    -- positive integer, sum of maximum values in each level
+    -- maximum theoretical (not necessarily feasible) sum of path nodes
+
+
+    Returns 1D numpy array of real numbers with a score, between 0 and 1,
+    for each chromosome in population.
+    '''
+
+    return path_sums(population, triangle, prev_lvl_nodes) / max_sum
+
+
+def packed_fitness(population, triangle, prev_lvl_nodes, max_sum):
+    '''
+    Inputs:
+
+    population -- 2D numpy array of 64-bit unsigned integers, sequence
+                  of packed chromosomes (see chromosome_packing module)
+
+    triangle, prev_lvl_nodes, max_sum -- the same as in fitness function
+
+
+    Steps are read directly from words, chromosomes are not unpacked.
+
+
+    Returns 1D numpy array of real numbers with a score, between 0 and 1,
+    for each chromosome in population.
+    '''
+
+    return packed_path_sums(population, triangle, prev_lvl_nodes) / max_sum
+
+
+@jit(nopython=True, cache=True)
+def path_sums(population, triangle, prev_lvl_nodes):
+    '''
+    Inputs:
+
+    population -- 2D boolean numpy array, sequence of chromosomes (paths)
+
+    triangle -- 1D unsigned integer numpy array, sequence of leaf nodes
+
+    prev_lvl_nodes -- 1D integer numpy array, total number of leaf nodes
+                      in all previous levels
+
+
+    Returns 1D numpy array of 64-bit unsigned integers, the sum
+    of visited leaf nodes for each path.
+    '''
+
+    sums = np.zeros(shape=population.shape[0], dtype=np.uint64)
+
+    for k in range(population.shape[0]):
+
+        pos = 0
+
+        for lvl in range(prev_lvl_nodes.size):
+            pos += population[k, lvl]
+            sums[k] += triangle[prev_lvl_nodes[lvl] + pos]
+
+    return sums
+
+
+@jit(nopython=True, cache=True)
+def packed_path_sums(population, triangle, prev_lvl_nodes):
+    '''
+    Inputs:
+
+    population -- 2D numpy array of 64-bit unsigned integers, sequence
+                  of packed chromosomes (paths)
+
+    triangle -- 1D unsigned integer numpy array, sequence of leaf nodes
+
+    prev_lvl_nodes -- 1D integer numpy array, total number of leaf nodes
+                      in all previous levels
+
+
+    Returns 1D numpy array of 64-bit unsigned integers, the sum
+    of visited leaf nodes for each path.
+    '''
+
+    sums = np.zeros(shape=population.shape[0], dtype=np.uint64)
+
+    for k in range(population.shape[0]):
+
+        pos = 0
+
+        for lvl in range(prev_lvl_nodes.size):
+            # Step is the bit lvl % 64 of the word lvl // 64
+            pos += np.int64((population[k, lvl >> 6] >> np.uint64(lvl & 63)) & np.uint64(1))
+            sums[k] += triangle[prev_lvl_nodes[lvl] + pos]
+
+    return sums
+
+
+@accepts_triangle
+def evolutionary_method(nlvls, max_sum, triangle, psize=100, ngen=101, cprob=0.7, mprob=0.05,
+                        options=GAOptions()):
+    '''
+    Inputs:
+
+    nlvls
+    -- positive integer, number of levels
+    -- number of binary steps in a single path
+    -- number of bits required to represent a single path
+
+    max_sum
+    -- positive integer, sum of maximum values in each level (row)
+    -- maximum theoretical (not necessarily feasible) sum of path nodes
+
+    triangle
+    -- 1D unsigned integer numpy array, sequence of leaf nodes
+       arranged from left to right and top to bottom
+
+    psize
+    -- positive integer number (default is 100), must be even
+    -- total number of chromosomes in a generation
+
+    ngen
+    -- positive integer number (default is 101)
+    -- maximum number of generations
+
+    cprob
+    -- positive real number (default is 0.7)
+    -- crossover (recombination) probability
+    -- probability that a pair of chromosomes will exchange
+       part of bit sequences
+
+    mprob
+    -- positive real number (default is 0.05)
+    -- mutation rate
+    -- probability that a bit will be inverted
+
+    options
+    -- GAOptions named tuple (default is GAOptions())
+    -- packed chromosomes, fitness cache, elitism and steady-state
+       replacement, see run function of binary_genetic_algorithm module
+
+
+    Returns a tuple with two elements:
+    -- the largest sum of leaf nodes (single positive integer number);
+    -- optimal path (1D unsigned integer numpy array with ones and zeros).
+    '''
+
+    # Total number of nodes in previous levels
+    prev_lvl_nodes = row_offsets(nlvls)
+
+    best_path = run(
+        fit_func=packed_fitness if options.packed else fitness,
+        crs_prob=cprob,
+        mut_prob=mprob,
+        chrom_length=nlvls,
+        pop_size=psize,
+        iterations=ngen,
+        fit_args=(triangle, prev_lvl_nodes, max_sum),
+        threshold=1.0,
+        options=options
+    )
+
+    grand_total = int(path_sums(best_path[np.newaxis], triangle, prev_lvl_nodes)[0])
+
+    return grand_total, best_path.astype(np.uint8)
+
+
+@accepts_triangle
+def island_method(nlvls, max_sum, triangle, psize=100, ngen=101, cprob=0.7, mprob=0.05,
+                  options=IslandOptions(), stats=False):
+    '''
+    Inputs:
+
+    nlvls, max_sum, triangle, psize, ngen, cprob, mprob
+    -- the same as in evolutionary_method function
+    -- psize and ngen apply to each island
+
+    options
+    -- IslandOptions named tuple (default is IslandOptions())
+    -- fields of GAOptions and number of islands (worker processes),
+       migration interval, number of migrants, topology and seed,
+       see run_islands function of island_model module
+
+    stats -- boolean (default is False), if statistics of islands are returned
+
+
+    Parallel counterpart of evolutionary_method: each island evolves
+    its own population in a separate process, so in the same time
+    options.nislands times more chromosomes are evaluated.
+
+
+    Returns a tuple with two elements (three if stats is True):
+    -- the largest sum of leaf nodes (single positive integer number);
+    -- optimal path (1D unsigned integer numpy array with ones and zeros);
+    -- list of dictionaries with statistics of each island.
+    '''
+
+    # Total number of nodes in previous levels
+    prev_lvl_nodes = row_offsets(nlvls)
+
+    best_path, report = run_islands(
+        fit_func=packed_fitness if options.packed else fitness,
+        crs_prob=cprob,
+        mut_prob=mprob,
+        chrom_length=nlvls,
+        pop_size=psize,
+        iterations=ngen,
+        fit_args=(triangle, prev_lvl_nodes, max_sum),
+        threshold=1.0,
+        options=options
+    )
+
+    grand_total = int(path_sums(best_path[np.newaxis], triangle, prev_lvl_nodes)[0])
+
+    if not stats:
+        return grand_total, best_path.astype(np.uint8)
+
+    return grand_total, best_path.astype(np.uint8), report
@@ -0,0 +1,386 @@
+from contextlib import nullcontext
+from multiprocessing import Pool
+
+import numpy as np
+from numba import jit
+
+from zadanie34.task34_prep import HEADER, compress_raw, map_raw, write_header
+from zadanie34.task34_utils import lvl_offset, narrowest_dtype
+
+
+# Kinds of generated triangles:
+# -- random -- random integers between 10 and 99;
+# -- consecutive -- consecutive positive integers, the rightmost path
+#    has the largest sum (the same as fabricate_data function);
+# -- planted -- random integers between 10 and 99, nodes of a random path
+#    are set to 100, so this path has the largest sum;
+# -- planted-consecutive -- consecutive positive integers, nodes of a random
+#    path are set to a number larger than any other node;
+# -- planted-leftmost -- the same, but the leftmost path is planted;
+# -- sparse -- zeros, nodes of a random path are set to 1.
+# Planted modes cover test cases of prep_test_cases function (task34_test module).
+MODES = ('random', 'consecutive', 'planted', 'planted-consecutive', 'planted-leftmost', 'sparse')
+
+# Modes with consecutive positive integers as background nodes
+CONSECUTIVE_MODES = ('consecutive', 'planted-consecutive', 'planted-leftmost')
+
+# Approximate number of nodes generated at once by a single worker,
+# boundaries of chunks do not depend on the number of workers
+CHUNK_NODES = 1 << 24
+
+# Identifier of a random stream of a planted path, larger than any chunk identifier
+PATH_STREAM = 1 << 40
+
+
+def split_levels(nlvls, chunk_nodes=CHUNK_NODES):
+    '''
+    Inputs:
+
+    nlvls -- positive integer, number of levels
+
+    chunk_nodes -- positive integer (default is CHUNK_NODES),
+                   approximate number of nodes in a chunk
+
+
+    A level is never split, so a chunk can be larger if a single level
+    has more nodes than the limit.
+
+
+    Returns a list of tuples with two integers, ranges of levels
+    (first inclusive, last exclusive).
+    '''
+
+    offsets = lvl_offset(np.arange(nlvls + 1, dtype=np.int64))
+
+    marks = np.arange(0, offsets[-1], chunk_nodes, dtype=np.int64)
+
+    limits = np.unique(np.searchsorted(offsets, marks, side='right') - 1)
+    limits = np.append(limits, nlvls).tolist()
+
+    return list(zip(limits[:-1], limits[1:]))
+
+
+def planted_path(nlvls, mode='planted', seed=0):
+    '''
+    Inputs:
+
+    nlvls -- positive integer, number of levels
+
+    mode -- string, one of MODES (default is 'planted')
+
+    seed -- non-negative integer (default is 0), seed of random data
+
+
+    Returns 1D unsigned integer numpy array with ones and zeros,
+    optimal path of a generated triangle, or None if the mode
+    has no known optimal path ('random').
+    '''
+
+    if mode == 'random':
+        return None
+
+    if mode == 'consecutive':
+        return np.ones(shape=nlvls, dtype=np.uint8)
+
+    if mode == 'planted-leftmost':
+        return np.zeros(shape=nlvls, dtype=np.uint8)
+
+    rng = np.random.default_rng([seed, PATH_STREAM])
+
+    return rng.integers(low=0, high=2, size=nlvls, dtype=np.uint8)
+
+
+def planted_node(nlvls, mode):
+    '''
+    Inputs:
+
+    nlvls -- positive integer, number of levels
+
+    mode -- string, one of MODES
+
+
+    Returns a positive integer, value of nodes of a planted path,
+    or None if the mode has no planted path ('random' and 'consecutive').
+    '''
+
+    if mode in ('random', 'consecutive'):
+        return None
+
+    if mode == 'sparse':
+        return 1
+
+    if mode == 'planted':
+        return 100
+
+    # Larger than the last (the largest) consecutive number
+    return max(100, lvl_offset(nlvls) + 1)
+
+
+def node_dtype(nlvls, mode):
+    '''
+    Inputs:
+
+    nlvls -- positive integer, number of levels
+
+    mode -- string, one of MODES
+
+
+    Returns the narrowest numpy unsigned integer data type of nodes
+    of a generated triangle.
+    '''
+
+    if mode in CONSECUTIVE_MODES:
+        return narrowest_dtype(max(lvl_offset(nlvls), planted_node(nlvls, mode) or 0))
+
+    return np.dtype(np.uint8)
+
+
+@jit(nopython=True, cache=True)
+def encode_levels(first_lvl, nlvls, nodes):
+    '''
+    Inputs:
+
+    first_lvl -- non-negative integer, index of the first level
+
+    nlvls -- positive integer, number of levels
+
+    nodes -- 1D unsigned integer numpy array, nodes of the levels
+
+
+    Converts numbers to text in two passes (lengths, then digits),
+    without creating any intermediate strings or lists.
+
+
+    Returns 1D numpy array of bytes (uint8), text with nodes separated
+    by spaces and levels separated by new line characters.
+    '''
+
+    ten = np.uint64(10)
+
+    size = 0
+
+    for k in range(nodes.size):
+
+        value = np.uint64(nodes[k])
+        size += 2  # the last digit and a separator
+
+        while value >= ten:
+            value //= ten
+            size += 1
+
+    text = np.empty(shape=size, dtype=np.uint8)
+
+    k = 0
+    pos = 0
+
+    for lvl in range(first_lvl, first_lvl + nlvls):
+
+        for i in range(lvl + 2):
+
+            value = np.uint64(nodes[k])
+            k += 1
+
+            ndigits = 1
+            rest = value // ten
+
+            while rest > 0:
+                rest //= ten
+                ndigits += 1
+
+            # Write digits from the last one
+            for d in range(ndigits - 1, -1, -1):
+                text[pos+d] = 48 + value % ten
+                value //= ten
+
+            pos += ndigits
+
+            text[pos] = 32 if i < lvl + 1 else 10
+            pos += 1
+
+    return text
+
+
+def generate_chunk(tar, nlvls, mode, seed, chunk_id, first_lvl, last_lvl, positions):
+    '''
+    Inputs:
+
+    tar
+    -- string, path to an output file of a proper size (.tri)
+    -- text file (.txt) is not modified, text is returned instead
+
+    nlvls -- positive integer, number of levels of the whole triangle
+
+    mode -- string, one of MODES
+
+    seed -- non-negative integer, seed of random data
+
+    chunk_id -- non-negative integer, index of a chunk
+
+    first_lvl, last_lvl -- non-negative integers, range of levels of a chunk
+
+    positions
+    -- 1D integer numpy array, positions of planted path nodes
+       in levels of a chunk
+    -- None if a path is not planted
+
+
+    Random numbers of each chunk come from their own stream, seeded with
+    the seed and the index of a chunk, so the result does not depend
+    on the number of workers.
+
+
+    Returns an integer (the sum of maximum values in each level of a chunk)
+    or a tuple with the integer and a text (bytes) for text files.
+    '''
+
+    rng = np.random.default_rng([seed, chunk_id])
+
+    begin = lvl_offset(first_lvl)
+    end = lvl_offset(last_lvl)
+
+    if mode in CONSECUTIVE_MODES:
+        nodes = np.arange(begin + 1, end + 1, dtype=node_dtype(nlvls, mode))
+    elif mode == 'sparse':
+        nodes = np.zeros(shape=end - begin, dtype=np.uint8)
+    else:
+        nodes = rng.integers(low=10, high=100, size=end - begin, dtype=np.uint8)
+
+    # Indexes of the first element in each row (relative to the chunk)
+    offsets = lvl_offset(np.arange(first_lvl, last_lvl, dtype=np.int64)) - begin
+
+    if positions is not None and mode != 'consecutive':
+        nodes[offsets + positions] = planted_node(nlvls, mode)
+
+    max_sum = int(np.sum(np.maximum.reduceat(nodes, offsets), dtype=np.uint64))
+
+    if tar.endswith('.txt'):
+        return max_sum, encode_levels(first_lvl, last_lvl - first_lvl, nodes).tobytes()
+
+    flat_triangle = map_raw(tar, nodes.dtype, last_lvl, 'r+')
+    flat_triangle[begin:] = nodes
+    flat_triangle.flush()
+
+    return max_sum
+
+
+def star_generate_chunk(args):
+    '''
+    Inputs:
+
+    args -- tuple, arguments of generate_chunk function
+
+
+    Returns output of generate_chunk function.
+    '''
+
+    return generate_chunk(*args)
+
+
+def write_chunks(raw, root_node, argpack, mapper):
+    '''
+    Inputs:
+
+    raw -- string, path to an output file, raw binary file (.tri)
+           of a proper size or text file (.txt)
+
+    root_node -- integer number, written to text files
+
+    argpack -- list of tuples, arguments of generate_chunk function for each chunk
+
+    mapper -- map function or imap method of a pool of workers
+
+
+    Chunks of text are written in order, as soon as they are ready.
+    Exceptions raised while writing files are not handled.
+
+
+    Returns a positive integer, the sum of maximum values in each level.
+    '''
+
+    if not raw.endswith('.txt'):
+        return sum(mapper(star_generate_chunk, argpack))
+
+    max_sum = 0
+
+    with open(file=raw, mode='wb') as f:
+
+        f.write('{:d}\n'.format(root_node).encode())
+
+        for chunk_sum, text in mapper(star_generate_chunk, argpack):
+            f.write(text)
+            max_sum += chunk_sum
+
+    return max_sum
+
+
+def generate(tar, nlvls, mode='random', seed=0, nproc=1, root_node=0):
+    '''
+    Inputs:
+
+    tar
+    -- string, path to an output file, will be overwritten
+    -- format depends on extension: raw binary file (.tri), compressed
+       binary file (.npz) or text file (.txt), the same as prepared
+       or expected by process_text function
+
+    nlvls
+    -- positive integer, number of levels
+    -- number of binary steps in a single path
+
+    mode -- string, one of MODES (default is 'random')
+
+    seed -- non-negative integer (default is 0), seed of random data
+
+    nproc -- positive integer (default is 1), number of worker processes
+
+    root_node -- integer number (default is 0)
+
+
+    The triangle is generated in chunks of levels, in parallel, and
+    written straight to the file, so it does not have to fit in memory.
+    The output is identical for the same seed, whatever the number
+    of workers. The optimal path can be recreated with planted_path function.
+    Exceptions raised while writing files are not handled.
+
+
+    Returns a tuple with four elements:
+    -- root node value (integer);
+    -- number of levels (positive integer);
+    -- sum of maximum values in each level (positive integer);
+    -- data type of leaf nodes.
+    '''
+
+    assert mode in MODES, 'Unknown mode: {}'.format(mode)
+    assert tar.endswith(('.tri', '.npz', '.txt')), 'Unknown format: {}'.format(tar)
+
+    dtype = node_dtype(nlvls, mode)
+
+    # Compressed file is made from a temporary raw binary file
+    raw = tar + '.part' if tar.endswith('.npz') else tar
+
+    steps = planted_path(nlvls, mode, seed)
+    positions = None if steps is None else np.add.accumulate(steps, dtype=np.int64)
+
+    chunks = split_levels(nlvls)
+
+    argpack = [(raw, nlvls, mode, seed, k, i, j, None if positions is None else positions[i:j])
+               for k, (i, j) in enumerate(chunks)]
+
+    if not raw.endswith('.txt'):
+        # Preallocate the output file
+        with open(file=raw, mode='wb') as f:
+            write_header(f, root_node, nlvls, 0, dtype)
+            f.truncate(HEADER.itemsize + lvl_offset(nlvls) * dtype.itemsize)
+
+    with Pool(processes=nproc) if nproc > 1 else nullcontext() as workers:
+        max_sum = write_chunks(raw, root_node, argpack, workers.imap if workers else map)
+
+    if not raw.endswith('.txt'):
+
+        with open(file=raw, mode='r+b') as f:
+            write_header(f, root_node, nlvls, max_sum, dtype)
+
+        if raw != tar:
+            compress_raw(raw, tar)
+
+    return root_node, nlvls, max_sum, dtype
@@ -0,0 +1,257 @@
+from os import path, replace
+
+import numpy as np
+
+from zadanie34.task34 import dp_table, extend_frontier, propagate
+from zadanie34.task34_prep import decode_integers
+from zadanie34.task34_triangle import accepts_triangle
+from zadanie34.task34_utils import accumulator_dtype, lvl_offset
+
+
+class IncrementalSolver:
+    '''
+    Keeps bottom-up totals (the largest sum of a path starting in each node)
+    for the whole triangle, so after a change of a single node only totals
+    of its ancestors are recalculated, not all nodes.
+
+    Attributes:
+
+    nlvls -- positive integer, number of levels
+
+    triangle -- 1D unsigned integer numpy array, own copy of leaf nodes
+
+    table -- 1D unsigned integer numpy array, bottom-up totals
+
+    last_cost -- non-negative integer, number of totals recalculated
+                 by the last update
+    '''
+
+    @accepts_triangle(fields=('nlvls', 'nodes'), position=1)
+    def __init__(self, nlvls, triangle):
+        '''
+        Inputs:
+
+        nlvls
+        -- positive integer, number of levels
+        -- number of binary steps in a single path
+
+        triangle
+        -- 1D unsigned integer numpy array, sequence of leaf nodes
+           arranged from left to right and top to bottom
+        -- the array is copied, new values must fit in its data type
+
+        Triangle object can be given in place of both arguments.
+        '''
+
+        self.nlvls = nlvls
+        self.triangle = np.array(triangle)
+        self.table = dp_table(nlvls, self.triangle, accumulator_dtype(nlvls, self.triangle.dtype))
+        self.last_cost = self.table.size
+
+    def update(self, lvl, index, value):
+        '''
+        Inputs:
+
+        lvl -- non-negative integer, index of a level, 0 is the highest one
+
+        index -- non-negative integer, position of a node in its level
+
+        value -- non-negative integer, new value of a node
+
+
+        Returns a positive integer, the largest sum of leaf nodes
+        after the change.
+        '''
+
+        assert 0 <= lvl < self.nlvls and 0 <= index < lvl + 2
+
+        self.triangle[lvl_offset(lvl) + index] = value
+
+        self.last_cost = propagate(self.nlvls, self.triangle, self.table, lvl, index, index)
+
+        return self.largest_sum()
+
+    def largest_sum(self):
+        '''
+        Returns a positive integer, the largest sum of leaf nodes.
+        '''
+
+        return max(self.table[0], self.table[1])
+
+    def best_path(self):
+        '''
+        Follows the largest totals from top to bottom, the same way
+        as bottom_up_method (ties go to the left).
+
+
+        Returns 1D unsigned integer numpy array with ones and zeros,
+        optimal path.
+        '''
+
+        best_path = np.empty(shape=self.nlvls, dtype=np.uint8)
+        pos = 0
+
+        for lvl in range(self.nlvls):
+            n = lvl_offset(lvl) + pos
+            best_path[lvl] = self.table[n+1] > self.table[n]
+            pos += int(best_path[lvl])
+
+        return best_path
+
+
+class AppendSolver:
+    '''
+    Top-down solver of a text file that grows by appending levels (lines)
+    at the bottom. Only the frontier is kept: the largest sums of paths
+    ending in each node of the last level, together with the number
+    of bytes of the text file that are already processed. After new lines
+    are appended, only these lines are parsed and the frontier is extended,
+    so appending k levels costs O(k * width) instead of solving again.
+
+    A line is processed only when it ends with a new line character,
+    so a line that is still being written is left for the next update.
+
+    Attributes:
+
+    src -- string, path to a text file (the same format as expected
+           by process_text function)
+
+    state_path -- string, path to a file with a saved state (.npz)
+
+    root_node -- integer number, or None if the first line is not read yet
+
+    nlvls -- non-negative integer, number of processed levels
+
+    offset -- non-negative integer, number of processed bytes of the text file
+
+    frontier -- 1D unsigned integer numpy array (uint64), the largest sums
+                of paths ending in each node of the last level
+    '''
+
+    def __init__(self, src, state_path=None):
+        '''
+        Inputs:
+
+        src -- string, path to a text file
+
+        state_path
+        -- string, path to a file with a saved state (.npz)
+        -- default is None, the name of the text file with .frontier.npz
+           extension in the same folder
+        -- the saved state is loaded if it exists and the text file
+           is not shorter than the processed part
+        '''
+
+        self.src = src
+        self.state_path = state_path or path.splitext(src)[0] + '.frontier.npz'
+
+        self.reset()
+
+        try:
+            with np.load(self.state_path) as data:
+                root_node, nlvls, offset = (int(num) for num in data['single_numbers'])
+                frontier = data['frontier']
+        except (IOError, OSError, KeyError, ValueError):
+            return
+
+        if 0 < offset <= path.getsize(src):
+            self.root_node, self.nlvls, self.offset = root_node, nlvls, offset
+            self.frontier = frontier
+
+    def reset(self):
+        '''
+        Forgets all processed levels, the next update reads the whole file.
+
+
+        This function does not return any value.
+        '''
+
+        self.root_node = None
+        self.nlvls = 0
+        self.offset = 0
+        self.frontier = np.zeros(shape=0, dtype=np.uint64)
+
+    def update(self):
+        '''
+        Parses lines appended since the last update and extends the frontier.
+        Exceptions raised while reading the file are not handled,
+        ValueError is raised if new lines are not valid levels.
+
+
+        Returns a non-negative integer, the largest sum of leaf nodes
+        of all processed levels.
+        '''
+
+        with open(file=self.src, mode='rb') as f:
+            f.seek(self.offset)
+            chunk = f.read()
+
+        # Skip an incomplete line at the end
+        end = chunk.rfind(b'\n') + 1
+
+        if end == 0:
+            return self.largest_sum()
+
+        begin = 0
+
+        if self.root_node is None:
+            begin = chunk.index(b'\n') + 1
+            self.root_node = int(chunk[:begin])
+
+        text = np.frombuffer(chunk[begin:end], dtype=np.uint8)
+
+        # Empty lines are ignored
+        nrows = sum(1 for line in chunk[begin:end].splitlines() if not line.isspace() and line)
+
+        # Number of nodes in new levels: (width + 1) + ... + (width + nrows)
+        width = self.nlvls + 1 if self.nlvls else 0
+        nnodes = lvl_offset(self.nlvls + nrows) - lvl_offset(self.nlvls)
+
+        nodes = np.empty(shape=nnodes, dtype=np.uint64)
+
+        if decode_integers(text, nodes, np.iinfo(np.int64).max) != nnodes:
+            raise ValueError('Unexpected number of nodes in levels {:d}-{:d}.'.format(
+                self.nlvls + 1, self.nlvls + nrows))
+
+        frontier = np.zeros(shape=self.nlvls + nrows + 1, dtype=np.uint64)
+        frontier[:width] = self.frontier
+
+        n = 0
+
+        for lvl in range(self.nlvls, self.nlvls + nrows):
+            width = extend_frontier(frontier, width, nodes[n:n+lvl+2])
+            n += lvl + 2
+
+        self.frontier = frontier
+        self.nlvls += nrows
+        self.offset += end
+
+        return self.largest_sum()
+
+    def largest_sum(self):
+        '''
+        Returns a non-negative integer, the largest sum of leaf nodes
+        of all processed levels (zero if there are no levels).
+        '''
+
+        return int(np.amax(self.frontier)) if self.nlvls else 0
+
+    def save(self):
+        '''
+        Writes the state to a temporary file and replaces the state file,
+        so the state file is never partially written.
+        Exceptions raised while writing the file are not handled.
+
+
+        This function does not return any value.
+        '''
+
+        with open(file=self.state_path + '.tmp', mode='wb') as f:
+            np.savez(
+                f,
+                single_numbers=np.fromiter(
+                    (self.root_node or 0, self.nlvls, self.offset), dtype=np.uint64),
+                frontier=self.frontier
+            )
+
+        replace(self.state_path + '.tmp', self.state_path)
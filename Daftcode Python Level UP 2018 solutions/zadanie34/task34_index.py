@@ -0,0 +1,245 @@
+from os import path
+
+import numpy as np
+from numba import jit
+
+from zadanie34.task34 import dp_table, fill_dp_table
+from zadanie34.task34_prep import HEADER, map_raw, write_header
+from zadanie34.task34_triangle import accepts_triangle
+from zadanie34.task34_utils import accumulator_dtype, lvl_offset
+
+
+# Type of raw binary files with bottom-up totals, they have the same
+# header as triangle files (.tri), max_sum field stores the largest sum
+INDEX_MAGIC = b'TDP1'
+
+
+@jit(nopython=True, cache=True)
+def follow_table(nlvls, table, lvl, index):
+    '''
+    Inputs:
+
+    nlvls -- positive integer, number of levels
+
+    table -- 1D unsigned integer numpy array, bottom-up totals
+
+    lvl -- integer, index of a level of the first node, -1 for the root node
+
+    index -- non-negative integer, position of the first node in its level
+
+
+    Follows the largest totals from a given node to the bottom
+    (ties go to the left), the same way as bottom_up_method.
+
+
+    Returns 1D unsigned integer numpy array with ones and zeros,
+    steps made below a given node.
+    '''
+
+    steps = np.empty(shape=nlvls-1-lvl, dtype=np.uint8)
+    pos = index
+
+    for k in range(steps.size):
+        n = lvl_offset(lvl + 1 + k) + pos
+        steps[k] = table[n+1] > table[n]
+        pos += steps[k]
+
+    return steps
+
+
+class PathIndex:
+    '''
+    Bottom-up totals (the largest sum of a path starting in each node)
+    of the whole triangle, computed once, answer queries about
+    the best path starting in any node: the sum in O(1) and the path
+    in O(path length), without solving a sub-triangle again.
+
+    Totals can be kept in memory or in a raw binary file, which is
+    memory-mapped read-only, so it opens instantly and its pages are
+    shared by all processes that use the same file. An index backed
+    by a file is pickled as its path, not as its contents.
+
+    Attributes:
+
+    nlvls -- positive integer, number of levels
+
+    root_node -- integer number
+
+    table -- 1D unsigned integer numpy array (or numpy.memmap),
+             bottom-up totals (output of dp_table function)
+
+    filepath -- string, path to the file with totals, or None
+    '''
+
+    def __init__(self, nlvls, table, root_node=0, filepath=None):
+        '''
+        Inputs:
+
+        nlvls -- positive integer, number of levels
+
+        table -- 1D unsigned integer numpy array (or numpy.memmap),
+                 bottom-up totals (output of dp_table function)
+
+        root_node -- integer number (default is 0)
+
+        filepath -- string, path to the file with totals (default is None)
+        '''
+
+        self.nlvls = nlvls
+        self.table = table
+        self.root_node = root_node
+        self.filepath = filepath
+
+    def __getstate__(self):
+
+        if self.filepath is None:
+            return self.__dict__
+
+        return {'filepath': self.filepath}
+
+    def __setstate__(self, state):
+
+        if 'table' in state:
+            self.__dict__.update(state)
+        else:
+            self.__dict__.update(open_index(state['filepath']).__dict__)
+
+    def check_node(self, lvl, index):
+        '''
+        Inputs:
+
+        lvl -- integer, index of a level, -1 for the root node
+
+        index -- non-negative integer, position of a node in its level
+
+
+        Raises IndexError if a node does not exist.
+
+
+        This function does not return any value.
+        '''
+
+        if not (-1 <= lvl < self.nlvls and 0 <= index < lvl + 2):
+            raise IndexError('No node {:d} in level {:d}.'.format(index, lvl))
+
+    def best_sum(self, lvl=-1, index=0):
+        '''
+        Inputs:
+
+        lvl
+        -- integer, index of a level, 0 is the highest one
+        -- default is -1, the root node
+
+        index -- non-negative integer (default is 0), position of a node
+                 in its level
+
+
+        Returns a positive integer, the largest sum of nodes of a path
+        starting in a given node (including the node itself).
+        '''
+
+        self.check_node(lvl, index)
+
+        if lvl < 0:
+            return self.root_node + int(max(self.table[0], self.table[1]))
+
+        return int(self.table[lvl_offset(lvl) + index])
+
+    def best_path(self, lvl=-1, index=0):
+        '''
+        Inputs:
+
+        lvl
+        -- integer, index of a level, 0 is the highest one
+        -- default is -1, the root node
+
+        index -- non-negative integer (default is 0), position of a node
+                 in its level
+
+
+        Returns 1D unsigned integer numpy array with ones and zeros,
+        steps of the optimal path below a given node (nlvls - 1 - lvl steps).
+        '''
+
+        self.check_node(lvl, index)
+
+        return follow_table(self.nlvls, self.table, lvl, index)
+
+
+@accepts_triangle(fields=('root_node', 'nlvls', 'nodes'), position=1)
+def build_index(tar, root_node, nlvls, triangle):
+    '''
+    Inputs:
+
+    tar
+    -- string, path to a raw binary file with totals, will be overwritten
+    -- if None, totals are kept in memory
+
+    root_node -- integer number
+
+    nlvls
+    -- positive integer, number of levels
+    -- number of binary steps in a single path
+
+    triangle
+    -- 1D unsigned integer numpy array (or numpy.memmap), sequence
+       of leaf nodes arranged from left to right and top to bottom
+
+
+    Triangle object can be given in place of root_node, nlvls and triangle.
+    Totals are written directly into the file, so a table larger
+    than memory can be built. Exceptions raised while writing the file
+    are not handled.
+
+
+    Returns PathIndex object.
+    '''
+
+    dtype = accumulator_dtype(nlvls, triangle.dtype)
+
+    if tar is None:
+        return PathIndex(nlvls, dp_table(nlvls, triangle, dtype), root_node)
+
+    # Preallocate the output file
+    with open(file=tar, mode='wb') as f:
+        write_header(f, root_node, nlvls, 0, dtype, INDEX_MAGIC)
+        f.truncate(HEADER.itemsize + lvl_offset(nlvls) * np.dtype(dtype).itemsize)
+
+    table = map_raw(tar, dtype, nlvls, 'r+')
+
+    fill_dp_table(nlvls, triangle, table)
+
+    largest_sum = int(max(table[0], table[1]))
+
+    table.flush()
+    del table
+
+    with open(file=tar, mode='r+b') as f:
+        write_header(f, root_node, nlvls, largest_sum, dtype, INDEX_MAGIC)
+
+    return open_index(tar)
+
+
+def open_index(filepath):
+    '''
+    Inputs:
+
+    filepath -- string, path to a raw binary file created by build_index function
+
+
+    Totals are memory-mapped (read-only), not copied into memory.
+    Exceptions raised while reading the file are not handled.
+
+
+    Returns PathIndex object.
+    '''
+
+    header = np.fromfile(filepath, dtype=HEADER, count=1)
+
+    assert header.size == 1 and header['magic'][0] == INDEX_MAGIC, 'Not an index file.'
+
+    root_node, nlvls = (int(header[key][0]) for key in ('root_node', 'nlvls'))
+
+    table = map_raw(filepath, header['dtype'][0].decode(), nlvls)
+
+    return PathIndex(nlvls, table, root_node, path.abspath(filepath))
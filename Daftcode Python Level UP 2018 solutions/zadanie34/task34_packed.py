@@ -0,0 +1,384 @@
+import numpy as np
+from numba import jit
+
+from zadanie34.task34_utils import lvl_offset
+
+
+# Layout of a header of packed triangle files (.trp), the same as of raw
+# binary files (.tri) with a number of bits per node, the header is followed
+# by 64-bit words with nodes packed one after another from the lowest bits
+PACKED_HEADER = np.dtype([
+    ('magic', 'S4'),
+    ('dtype', 'S4'),
+    ('root_node', '<u8'),
+    ('nlvls', '<u8'),
+    ('max_sum', '<u8'),
+    ('bits', '<u8')
+])
+
+PACKED_MAGIC = b'TRP1'
+
+# Number of bits of a word
+WORD_BITS = 64
+
+
+def count_words(nnodes, bits):
+    '''
+    Inputs:
+
+    nnodes -- non-negative integer, number of nodes
+
+    bits -- positive integer, number of bits per node
+
+
+    Returns a non-negative integer, number of 64-bit words that store
+    given nodes.
+    '''
+
+    return (nnodes * bits + WORD_BITS - 1) // WORD_BITS
+
+
+def node_bits(nodes):
+    '''
+    Inputs:
+
+    nodes -- 1D unsigned integer numpy array (or numpy.memmap), leaf nodes
+
+
+    Returns a positive integer, the smallest number of bits that fits
+    the largest node. Raises ValueError if nodes do not fit 63 bits.
+    '''
+
+    bits = max(1, int(np.amax(nodes)).bit_length()) if nodes.size else 1
+
+    if bits >= WORD_BITS:
+        raise ValueError('Nodes are too large to be packed.')
+
+    return bits
+
+
+@jit(nopython=True, cache=True)
+def pack_into(nodes, bits, words):
+    '''
+    Inputs:
+
+    nodes -- 1D unsigned integer numpy array (or numpy.memmap), leaf nodes
+
+    bits -- positive integer, less than 64, number of bits per node
+
+    words -- 1D numpy array (or numpy.memmap) of 64-bit unsigned integers
+             filled with zeros, output of packed nodes
+
+
+    Node k takes bits k * bits, ..., (k + 1) * bits - 1 counted from
+    the lowest bit of the first word, a node can be split between two words.
+
+
+    This function does not return any value.
+    '''
+
+    pos = 0
+
+    for node in nodes:
+
+        word, shift = pos // WORD_BITS, pos % WORD_BITS
+        value = np.uint64(node)
+
+        words[word] |= value << np.uint64(shift)
+
+        if shift + bits > WORD_BITS:
+            words[word+1] |= value >> np.uint64(WORD_BITS - shift)
+
+        pos += bits
+
+
+@jit(nopython=True, cache=True)
+def unpack_into(words, bits, start, out):
+    '''
+    Inputs:
+
+    words -- 1D numpy array (or numpy.memmap) of 64-bit unsigned integers,
+             packed nodes (see pack_into function)
+
+    bits -- positive integer, less than 64, number of bits per node
+
+    start -- non-negative integer, index of the first unpacked node
+
+    out -- 1D integer numpy array, output of out.size consecutive nodes
+
+
+    Words are read one by one into a buffer, nodes are taken from its
+    lowest bits, so there is no division per node.
+
+
+    This function does not return any value.
+    '''
+
+    if not out.size:
+        return
+
+    mask = np.uint64((1 << bits) - 1)
+
+    word, shift = start * bits // WORD_BITS, start * bits % WORD_BITS
+
+    # Buffer with remaining bits of the current word
+    buffer = words[word] >> np.uint64(shift)
+    nbits = WORD_BITS - shift
+
+    for i in range(out.size):
+
+        if nbits >= bits:
+            out[i] = buffer & mask
+            buffer >>= np.uint64(bits)
+            nbits -= bits
+        else:
+            # Lower bits of a node are in the buffer, higher in the next word
+            word += 1
+            out[i] = (buffer | (words[word] << np.uint64(nbits))) & mask
+            buffer = words[word] >> np.uint64(bits - nbits)
+            nbits += WORD_BITS - bits
+
+
+class PackedNodes:
+    '''
+    Leaf nodes arranged from left to right and top to bottom, stored
+    with a fixed number of bits per node in 64-bit words. Values 10..99
+    take 7 bits instead of 8 bits of uint8 nodes, so a triangle takes
+    12.5% less memory (or disk space, words can be memory-mapped).
+
+    Nodes are unpacked on demand, slices return numpy arrays with
+    the original data type. simple_bottom_up function decodes packed
+    nodes row by row, other solvers need unpacked nodes (see unpack method).
+
+    Attributes:
+
+    words -- 1D numpy array (or numpy.memmap) of 64-bit unsigned integers,
+             packed nodes (see pack_into function)
+
+    bits -- positive integer, less than 64, number of bits per node
+
+    dtype -- numpy unsigned integer data type of unpacked nodes
+
+    size -- non-negative integer, number of nodes
+    '''
+
+    __slots__ = ('words', 'bits', 'dtype', 'size')
+
+    def __init__(self, words, bits, dtype, size):
+        '''
+        Inputs:
+
+        words -- 1D numpy array (or numpy.memmap) of 64-bit unsigned integers
+
+        bits -- positive integer, less than 64, number of bits per node
+
+        dtype -- numpy unsigned integer data type of unpacked nodes
+
+        size -- non-negative integer, number of nodes
+        '''
+
+        assert 0 < bits < WORD_BITS and words.size >= count_words(size, bits), \
+            'Incomplete packed nodes.'
+
+        self.words = words
+        self.bits = bits
+        self.dtype = np.dtype(dtype)
+        self.size = size
+
+    @classmethod
+    def from_nodes(cls, nodes, bits=None):
+        '''
+        Inputs:
+
+        nodes -- 1D unsigned integer numpy array (or numpy.memmap), leaf nodes
+
+        bits
+        -- positive integer, less than 64, number of bits per node
+        -- if None (default), the smallest number of bits that fits
+           the largest node
+
+
+        Returns PackedNodes object with words kept in memory.
+        '''
+
+        if bits is None:
+            bits = node_bits(nodes)
+
+        words = np.zeros(shape=count_words(nodes.size, bits), dtype=np.uint64)
+        pack_into(nodes, bits, words)
+
+        return cls(words, bits, nodes.dtype, nodes.size)
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, key):
+
+        if not isinstance(key, slice):
+            raise TypeError('Packed nodes support only slices.')
+
+        start, stop, step = key.indices(self.size)
+
+        return self.unpack(start, max(start, stop))[::step]
+
+    def __repr__(self):
+        return 'PackedNodes(size={:d}, bits={:d}, dtype={})'.format(self.size, self.bits,
+                                                                    self.dtype)
+
+    def unpack(self, start=0, stop=None):
+        '''
+        Inputs:
+
+        start -- non-negative integer (default is 0), index of the first node
+
+        stop -- non-negative integer, index after the last node
+                (default is None, all nodes to the end)
+
+
+        Returns 1D unsigned integer numpy array, unpacked nodes.
+        '''
+
+        out = np.empty(shape=(self.size if stop is None else stop) - start, dtype=self.dtype)
+        unpack_into(self.words, self.bits, start, out)
+
+        return out
+
+
+def map_words(filepath, nwords, mode='r'):
+    '''
+    Inputs:
+
+    filepath -- string, path to a packed triangle file (.trp)
+
+    nwords -- non-negative integer, number of words
+
+    mode
+    -- string, access mode of numpy.memmap
+    -- default is 'r' (read-only)
+
+
+    Returns 1D numpy.memmap of 64-bit unsigned integers with packed nodes.
+    '''
+
+    return np.memmap(filename=filepath, dtype='<u8', mode=mode,
+                     offset=PACKED_HEADER.itemsize, shape=nwords)
+
+
+def save_packed(tar, root_node, nlvls, max_sum, flat_triangle):
+    '''
+    Inputs:
+
+    tar -- string, path to a packed triangle file (.trp)
+
+    root_node -- integer number
+
+    nlvls -- positive integer, number of levels
+
+    max_sum -- positive integer, sum of maximum values in each level (row)
+
+    flat_triangle
+    -- 1D unsigned integer numpy array (or numpy.memmap), sequence
+       of leaf nodes arranged from left to right and top to bottom
+
+
+    Nodes are packed directly into the memory-mapped file, so a triangle
+    larger than memory can be packed. Exceptions raised while writing
+    the file are not handled.
+
+
+    This function does not return any value.
+    '''
+
+    bits = node_bits(flat_triangle)
+    nwords = count_words(flat_triangle.size, bits)
+
+    header = np.zeros(shape=1, dtype=PACKED_HEADER)
+    header['magic'] = PACKED_MAGIC
+    header['dtype'] = flat_triangle.dtype.newbyteorder('<').str
+    header['root_node'] = root_node
+    header['nlvls'] = nlvls
+    header['max_sum'] = max_sum
+    header['bits'] = bits
+
+    with open(file=tar, mode='wb') as f:
+        f.write(header.tobytes())
+        f.truncate(PACKED_HEADER.itemsize + nwords * 8)
+
+    words = map_words(tar, nwords, 'r+')
+
+    pack_into(flat_triangle, bits, words)
+
+    words.flush()
+    del words
+
+
+def load_packed(filepath):
+    '''
+    Inputs:
+
+    filepath -- string, path to a packed triangle file (.trp)
+
+
+    Words are memory-mapped (read-only), not copied into memory.
+    Exceptions raised while reading the file are not handled.
+
+
+    Returns a tuple with four elements, the same as load_data function,
+    leaf nodes are PackedNodes object.
+    '''
+
+    header = np.fromfile(filepath, dtype=PACKED_HEADER, count=1)
+
+    assert header.size == 1 and header['magic'][0] == PACKED_MAGIC, 'Not a packed triangle file.'
+
+    root_node, nlvls, max_sum, bits = (int(header[key][0])
+                                       for key in ('root_node', 'nlvls', 'max_sum', 'bits'))
+
+    nnodes = lvl_offset(nlvls)
+
+    words = map_words(filepath, count_words(nnodes, bits))
+
+    nodes = PackedNodes(words, bits, header['dtype'][0].decode(), nnodes)
+
+    return root_node, nlvls, nodes, max_sum
+
+
+@jit(nopython=True, cache=True)
+def packed_bottom_up(nlvls, words, bits, dtype):
+    '''
+    Inputs:
+
+    nlvls -- positive integer, number of levels
+
+    words -- 1D numpy array of 64-bit unsigned integers, packed nodes
+
+    bits -- positive integer, less than 64, number of bits per node
+
+    dtype
+    -- numpy unsigned integer data type of totals
+    -- output of accumulator_dtype function
+
+
+    Kernel of simple_bottom_up function for packed nodes. Each level
+    is unpacked into a single row buffer right before it is used,
+    so the whole triangle is never unpacked.
+
+
+    Returns a positive integer number, the largest sum of leaf nodes.
+    '''
+
+    # Initialize totals with nodes from the last row
+    totals = np.empty(shape=nlvls + 1, dtype=dtype)
+    unpack_into(words, bits, lvl_offset(nlvls - 1), totals)
+
+    row = np.empty(shape=nlvls, dtype=dtype)
+
+    for lvl in range(nlvls - 2, -1, -1):
+
+        unpack_into(words, bits, lvl_offset(lvl), row[:lvl+2])
+
+        # Choose a route (left or right node) and add it to a node above
+        for i in range(lvl + 2):
+            totals[i] = max(totals[i], totals[i+1]) + row[i]
+
+    return max(totals[0], totals[1])
@@ -0,0 +1,261 @@
+from ctypes import c_uint64
+from multiprocessing import Pool, Value
+from multiprocessing.shared_memory import SharedMemory
+from operator import itemgetter
+
+import numpy as np
+from numba import jit, prange
+
+from zadanie34.task34 import gray_code_brute_force
+from zadanie34.task34_triangle import accepts_triangle
+from zadanie34.task34_utils import accumulator_dtype, lvl_offset
+
+
+@accepts_triangle
+def parallel_brute_force(nlvls, max_sum, triangle, nproc, chunk=1 << 16):
+    '''
+    Inputs:
+
+    nlvls
+    -- positive integer, number of levels, less than 63
+    -- number of binary steps in a single path
+    -- number of bits required to represent a single path
+
+    max_sum
+    -- positive integer, sum of maximum values in each level (row)
+    -- maximum theoretical (not necessarily feasible) sum of path nodes
+
+    triangle
+    -- 1D unsigned integer numpy array (or numpy.memmap), sequence
+       of leaf nodes arranged from left to right and top to bottom
+
+    nproc -- positive integer, number of worker processes
+
+    chunk -- positive integer (default is 2 ** 16), number of paths
+             taken by a worker at once
+
+
+    The triangle is copied into shared memory once, not sent with each task.
+    Workers take consecutive ranges of paths (in Gray code order) from a shared
+    counter, so faster workers search more of them. The largest sum found
+    so far is shared as well, all workers stop as soon as it reaches max_sum.
+
+
+    Returns a tuple with two elements:
+    -- the largest sum of leaf nodes (single positive integer number);
+    -- optimal path (1D unsigned integer numpy array with ones and zeros).
+    '''
+
+    # Total number of possible paths
+    npaths = 1 << nlvls  # 2 ** nlvls
+
+    nodes = triangle[:lvl_offset(nlvls)]
+
+    block = SharedMemory(create=True, size=max(nodes.nbytes, 1))
+
+    try:
+
+        np.ndarray(shape=nodes.size, dtype=nodes.dtype, buffer=block.buf)[:] = nodes
+
+        # Position of the next range of paths and the largest sum found so far
+        counter = Value(c_uint64, 0)
+        incumbent = Value(c_uint64, 0)
+
+        initargs = (block.name, nlvls, max_sum, nodes.dtype, npaths, counter, incumbent)
+
+        with Pool(processes=nproc, initializer=attach_worker, initargs=initargs) as workers:
+
+            results = [workers.apply_async(func=steal_work, args=(chunk,)) for _ in range(nproc)]
+
+            results = [res.get() for res in results]
+
+    finally:
+        block.close()
+        block.unlink()
+
+    grand_total, best_path = max(results, key=itemgetter(0))
+
+    return grand_total, best_path
+
+
+# Shared data of a worker process of parallel_brute_force, set by attach_worker
+worker_state = {}
+
+
+def attach_worker(name, nlvls, max_sum, dtype, npaths, counter, incumbent):
+    '''
+    Inputs:
+
+    name -- string, name of a shared memory block with leaf nodes
+
+    nlvls -- positive integer, number of levels
+
+    max_sum -- positive integer, sum of maximum values in each level (row)
+
+    dtype -- numpy data type of leaf nodes
+
+    npaths -- positive integer, total number of paths
+
+    counter -- shared 64-bit unsigned integer, position of the next range of paths
+
+    incumbent -- shared 64-bit unsigned integer, the largest sum found so far
+
+
+    Initializer of worker processes, maps shared leaf nodes without copying them.
+
+
+    This function does not return any value.
+    '''
+
+    block = SharedMemory(name=name)
+
+    worker_state.update(
+        block=block,  # keeps the memory mapped as long as the worker lives
+        triangle=np.ndarray(shape=lvl_offset(nlvls), dtype=dtype, buffer=block.buf),
+        nlvls=nlvls,
+        max_sum=max_sum,
+        npaths=npaths,
+        counter=counter,
+        incumbent=incumbent
+    )
+
+
+def steal_work(chunk):
+    '''
+    Inputs:
+
+    chunk -- positive integer, number of paths taken at once
+
+
+    Takes ranges of paths from the shared counter until all paths are taken
+    or the largest sum found by any worker reaches max_sum.
+
+
+    Returns a tuple with two elements:
+    -- the largest sum of leaf nodes found by a worker (-1 if none);
+    -- its path (1D unsigned integer numpy array with ones and zeros or None).
+    '''
+
+    nlvls, max_sum, npaths, triangle, counter, incumbent = itemgetter(
+        'nlvls', 'max_sum', 'npaths', 'triangle', 'counter', 'incumbent')(worker_state)
+
+    grand_total, best_path = -1, None
+
+    while incumbent.value < max_sum:
+
+        with counter.get_lock():
+            start = counter.value
+            stop = counter.value = min(start + chunk, npaths)
+
+        if start == stop:
+            break
+
+        total, path = gray_code_brute_force(nlvls, max_sum, triangle, start, stop)
+
+        if grand_total < total:
+            grand_total, best_path = total, path
+
+        with incumbent.get_lock():
+            incumbent.value = max(incumbent.value, total)
+
+    return grand_total, best_path
+
+
+@accepts_triangle(fields=('nlvls', 'nodes'))
+def parallel_bottom_up(nlvls, triangle, tile=4096, depth=64):
+    '''
+    Inputs:
+
+    nlvls
+    -- positive integer, number of levels
+    -- number of binary steps in a single path
+    -- number of bits required to represent a single path
+
+    triangle
+    -- 1D unsigned integer numpy array, sequence of leaf nodes
+       arranged from left to right and top to bottom
+
+    tile
+    -- positive integer (default is 4096)
+    -- number of nodes of a level processed by a single thread
+
+    depth
+    -- positive integer (default is 64)
+    -- number of levels processed between synchronizations of threads
+
+
+    Levels are processed in blocks of depth rows. Each tile of a block
+    copies its part of a level together with depth extra nodes on the right
+    (the nodes it depends on) and goes up independently of other tiles,
+    at the cost of a small amount of repeated work (trapezoidal tiling).
+    Threads share the triangle and two level buffers, and are synchronized
+    only once per block. The number of threads is controlled by numba
+    (NUMBA_NUM_THREADS environment variable or numba.set_num_threads).
+    Threads of numba are not fork-safe: worker processes forked later
+    by the same process (for example by parallel_brute_force) can hang
+    at exit, unless multiprocessing uses 'spawn' or 'forkserver' start method.
+
+
+    Returns a positive integer number, the largest sum of leaf nodes.
+    '''
+
+    return tiled_bottom_up(nlvls, triangle, accumulator_dtype(nlvls, triangle.dtype), tile, depth)
+
+
+@jit(nopython=True, cache=True, parallel=True)
+def tiled_bottom_up(nlvls, triangle, dtype, tile, depth):
+    '''
+    Inputs:
+
+    nlvls -- positive integer, number of levels
+
+    triangle -- 1D unsigned integer numpy array, sequence of leaf nodes
+
+    dtype
+    -- numpy unsigned integer data type of totals
+    -- output of accumulator_dtype function
+
+    tile, depth -- positive integers, the same as in parallel_bottom_up function
+
+
+    Multi-threaded kernel of parallel_bottom_up function.
+
+
+    Returns a positive integer number, the largest sum of leaf nodes.
+    '''
+
+    lvl = nlvls - 1
+
+    # Initialize totals with nodes from the last row and insure that a range
+    # of a data type is enough to handle this values (prevent oveflow)
+    current = triangle[lvl_offset(lvl):lvl_offset(nlvls)].astype(dtype)
+    above = np.empty_like(current)
+
+    while lvl > 0:
+
+        steps = min(depth, lvl)
+
+        # Number of nodes in the highest level of a block
+        width = lvl - steps + 2
+
+        for t in prange((width + tile - 1) // tile):
+
+            a = t * tile
+            b = min(a + tile, width)
+
+            totals = current[a:b+steps].copy()
+
+            for s in range(1, steps + 1):
+
+                n = lvl_offset(lvl - s) + a
+
+                # Choose a route (left or right node) and add it to a node above
+                for i in range(b - a + steps - s):
+                    totals[i] = max(totals[i], totals[i+1]) + triangle[n+i]
+
+            above[a:b] = totals[:b-a]
+
+        current, above = above, current
+        lvl -= steps
+
+    return max(current[0], current[1])
@@ -1,6 +1,30 @@
-from os import path
+from contextlib import nullcontext
+from itertools import starmap
+from multiprocessing import Pool
+from os import path, remove, replace
 
 import numpy as np
+from numba import jit
+
+from zadanie34.task34_packed import load_packed, save_packed
+from zadanie34.task34_stats import LevelStats, level_stats
+from zadanie34.task34_utils import lvl_offset, narrowest_dtype
+
+
+# Layout of a header of raw binary triangle files (.tri), the header is
+# followed by leaf nodes arranged from left to right and top to bottom
+HEADER = np.dtype([
+    ('magic', 'S4'),
+    ('dtype', 'S4'),
+    ('root_node', '<u8'),
+    ('nlvls', '<u8'),
+    ('max_sum', '<u8')
+])
+
+MAGIC = b'TRI1'
+
+# Approximate size of a chunk of text parsed at once, in bytes
+CHUNK_SIZE = 1 << 25
 
 
 def prepare_data(root_node, levels):
@@ -15,6 +39,11 @@ def prepare_data(root_node, levels):
     -- each array contains leaf nodes
 
 
+    Statistics are computed with level_stats function, the same as
+    for parsed text. Leaf nodes keep the data type of given levels,
+    so solvers choose accumulators for it (see accumulator_dtype function).
+
+
     Returns a dictionary with three 1D unsigned integer numpy arrays:
     -- single_numbers -- contains three elements (root node, number of levels,
        sum of maximum values in each levels);
@@ -25,24 +54,518 @@ def prepare_data(root_node, levels):
 
     nlvls = len(levels)
 
-    # Sum of maximum values in each level (row)
-    max_sum = np.sum([np.amax(lvl) for lvl in levels])
+    flat_triangle = np.concatenate(levels)
 
-    single_numbers = np.fromiter((root_node, nlvls, max_sum), dtype=np.uint32)
+    stats = level_stats(nlvls, flat_triangle)
 
-    # Sum of all nodes for each level (row)
-    level_totals = np.fromiter([np.sum(lvl) for lvl in levels], dtype=np.uint32)
+    # Sum of maximum values in each level (row)
+    max_sum = np.sum(stats['maxima'], dtype=np.uint64)
 
-    flat_triangle = np.concatenate(levels)
+    single_numbers = np.fromiter((root_node, nlvls, max_sum), dtype=np.uint64)
 
     return {
         'single_numbers': single_numbers,
-        'level_totals': level_totals,
+        'level_totals': stats['totals'],
         'flat_triangle': flat_triangle
     }
 
 
-def process_text(src):
+def write_header(f, root_node, nlvls, max_sum, dtype, magic=MAGIC):
+    '''
+    Inputs:
+
+    f -- binary file object opened for writing
+
+    root_node -- integer number
+
+    nlvls -- positive integer, number of levels
+
+    max_sum -- positive integer, sum of maximum values in each level (row)
+
+    dtype -- numpy data type of leaf nodes
+
+    magic -- 4 bytes (default is MAGIC), type of a file
+
+
+    Writes a header of a raw binary file (.tri) at the beginning of a file.
+
+
+    This function does not return any value.
+    '''
+
+    header = np.zeros(shape=1, dtype=HEADER)
+    header['magic'] = magic
+    header['dtype'] = np.dtype(dtype).newbyteorder('<').str
+    header['root_node'] = root_node
+    header['nlvls'] = nlvls
+    header['max_sum'] = max_sum
+
+    f.seek(0)
+    f.write(header.tobytes())
+
+
+def map_raw(filepath, dtype, nlvls, mode='r'):
+    '''
+    Inputs:
+
+    filepath -- string, path to a raw binary file (.tri)
+
+    dtype -- numpy data type of leaf nodes
+
+    nlvls -- positive integer, number of levels
+
+    mode
+    -- string, access mode of numpy.memmap
+    -- default is 'r' (read-only)
+
+
+    Returns 1D unsigned integer numpy.memmap with leaf nodes.
+    '''
+
+    return np.memmap(
+        filename=filepath,
+        dtype=np.dtype(dtype).newbyteorder('<'),
+        mode=mode,
+        offset=HEADER.itemsize,
+        shape=(3 + nlvls) * nlvls // 2  # arithmetic series
+    )
+
+
+def save_raw(tar, root_node, nlvls, max_sum, flat_triangle):
+    '''
+    Inputs:
+
+    tar -- string, path to a raw binary file (.tri)
+
+    root_node -- integer number
+
+    nlvls -- positive integer, number of levels
+
+    max_sum -- positive integer, sum of maximum values in each level (row)
+
+    flat_triangle
+    -- 1D unsigned integer numpy array, sequence of leaf nodes
+       arranged from left to right and top to bottom
+
+
+    Writes a small header followed by uncompressed leaf nodes,
+    so the file can be memory-mapped by load_data function.
+    Exceptions raised while writing the file are not handled.
+
+
+    This function does not return any value.
+    '''
+
+    # Store nodes in a fixed byte order, independent of the machine
+    flat_triangle = np.asarray(flat_triangle)
+    flat_triangle = flat_triangle.astype(flat_triangle.dtype.newbyteorder('<'), copy=False)
+
+    with open(file=tar, mode='wb') as f:
+        write_header(f, root_node, nlvls, max_sum, flat_triangle.dtype)
+        f.write(flat_triangle.tobytes())
+
+
+def load_raw(filepath):
+    '''
+    Inputs:
+
+    filepath -- string, path to a raw binary file (.tri)
+
+
+    Leaf nodes are memory-mapped (read-only), not copied into memory.
+    Exceptions raised while reading the file are not handled.
+
+
+    Returns a tuple with four elements, the same as load_data function.
+    '''
+
+    header = np.fromfile(filepath, dtype=HEADER, count=1)
+
+    assert header.size == 1 and header['magic'][0] == MAGIC, 'Not a triangle file.'
+
+    root_node, nlvls, max_sum = (int(header[key][0]) for key in ('root_node', 'nlvls', 'max_sum'))
+
+    flat_triangle = map_raw(filepath, header['dtype'][0].decode(), nlvls)
+
+    return root_node, nlvls, flat_triangle, max_sum
+
+
+def split_text(src, begin, end, nchunks):
+    '''
+    Inputs:
+
+    src -- string, path to a text file
+
+    begin, end
+    -- non-negative integers, range of bytes to split
+    -- begin must point to the beginning of a line
+
+    nchunks -- positive integer, desired number of chunks
+
+
+    Returns a list of tuples with two integers, ranges of bytes
+    (begin inclusive, end exclusive) that start at the beginning of a line.
+    '''
+
+    limits = [begin]
+
+    with open(file=src, mode='rb') as f:
+
+        for k in range(1, nchunks):
+
+            f.seek(begin + k * (end - begin) // nchunks)
+
+            # Move to the beginning of the next line
+            f.readline()
+
+            if limits[-1] < f.tell() < end:
+                limits.append(f.tell())
+
+    limits.append(end)
+
+    return list(zip(limits[:-1], limits[1:]))
+
+
+@jit(nopython=True, cache=True)
+def count_digits(text):
+    '''
+    Inputs:
+
+    text -- 1D numpy array of bytes (uint8)
+
+
+    Returns a non-negative integer, length of the longest sequence
+    of digits in the text (number of digits of the longest number).
+    '''
+
+    longest = 0
+    ndigits = 0
+
+    for char in text:
+
+        if 48 <= char <= 57:  # digits
+            ndigits += 1
+            longest = max(longest, ndigits)
+        else:
+            ndigits = 0
+
+    return longest
+
+
+def count_rows(src, begin, end):
+    '''
+    Inputs:
+
+    src -- string, path to a text file
+
+    begin, end -- non-negative integers, range of bytes (chunk of lines)
+
+
+    Returns a tuple with two non-negative integers, number of lines
+    in a chunk and number of digits of the longest number in a chunk.
+    '''
+
+    with open(file=src, mode='rb') as f:
+        f.seek(begin)
+        chunk = f.read(end - begin)
+
+    nrows = chunk.count(b'\n')
+
+    # The last line of a file does not have to end with a new line character
+    if chunk and not chunk.endswith(b'\n'):
+        nrows += 1
+
+    return nrows, count_digits(np.frombuffer(chunk, dtype=np.uint8))
+
+
+@jit(nopython=True, cache=True)
+def decode_integers(text, out, limit):
+    '''
+    Inputs:
+
+    text
+    -- 1D numpy array of bytes (uint8), text with non-negative integer numbers
+    -- numbers must be separated by white space characters
+
+    out
+    -- 1D unsigned integer numpy array, modified in place
+    -- converted numbers are written from the beginning, the rest
+       of numbers is only counted
+
+    limit -- positive integer, the largest allowed value of a number
+
+
+    Converts text to numbers in a single pass, without creating
+    any intermediate strings or lists.
+
+
+    Returns a non-negative integer, number of numbers found in the text.
+    '''
+
+    count = 0
+    number = 0
+    indigit = False
+
+    for char in text:
+
+        if 48 <= char <= 57:  # digits
+            number = number * 10 + (char - 48)
+            indigit = True
+
+        elif char == 32 or char == 10 or char == 13 or char == 9:  # white space
+
+            if indigit:
+
+                if number > limit:
+                    raise ValueError('Node values exceed the range of the data type.')
+
+                if count < out.size:
+                    out[count] = number
+
+                count += 1
+                number = 0
+                indigit = False
+
+        else:
+            raise ValueError('Unexpected characters in text data.')
+
+    if indigit:
+
+        if number > limit:
+            raise ValueError('Node values exceed the range of the data type.')
+
+        if count < out.size:
+            out[count] = number
+
+        count += 1
+
+    return count
+
+
+def parse_chunk(src, begin, end, tar, first_lvl, nrows, dtype):
+    '''
+    Inputs:
+
+    src -- string, path to a text file
+
+    begin, end -- non-negative integers, range of bytes (chunk of lines)
+
+    tar -- string, path to a raw binary file (.tri) of a proper size
+
+    first_lvl -- non-negative integer, index of the first level in a chunk
+
+    nrows -- non-negative integer, number of levels in a chunk
+
+    dtype -- numpy data type of leaf nodes
+
+
+    Converts text to numbers and writes them directly into the output file
+    at the position of the first level.
+
+
+    Returns a dictionary with statistics of levels of a chunk
+    (output of level_stats function), or None for an empty chunk.
+    '''
+
+    if nrows == 0:
+        return None
+
+    with open(file=src, mode='rb') as f:
+        f.seek(begin)
+        text = np.frombuffer(f.read(end - begin), dtype=np.uint8)
+
+    flat_triangle = map_raw(tar, dtype, first_lvl + nrows, 'r+')
+
+    # Nodes of levels in a chunk
+    nodes = flat_triangle[lvl_offset(first_lvl):]
+
+    if decode_integers(text, nodes, int(np.iinfo(dtype).max)) != nodes.size:
+        raise ValueError('Unexpected number of nodes in levels {:d}-{:d}.'.format(
+            first_lvl + 1, first_lvl + nrows))
+
+    flat_triangle.flush()
+
+    # Statistics are plain arrays, not views of the memory-mapped file
+    return level_stats(nrows, np.asarray(nodes), first_lvl)
+
+
+def text_range(src):
+    '''
+    Inputs:
+
+    src -- string, path to a text file (raw data)
+
+
+    Returns a tuple with three integers: root node value and the range
+    of bytes with levels (first inclusive, last exclusive), without
+    trailing white space characters.
+    '''
+
+    with open(file=src, mode='rb') as f:
+
+        root_node = int(f.readline().strip())
+        begin = f.tell()
+
+        # Ignore trailing white space characters
+        end = f.seek(0, 2)
+
+        while end > begin:
+            f.seek(end - 1)
+            if not f.read(1).isspace():
+                break
+            end -= 1
+
+    return root_node, begin, end
+
+
+def count_levels(src, chunks, mapper, dtype=None):
+    '''
+    Inputs:
+
+    src -- string, path to a text file
+
+    chunks -- list of tuples with two integers, ranges of bytes (output of split_text function)
+
+    mapper -- starmap function (built-in or a method of a pool of workers)
+
+    dtype -- numpy data type of leaf nodes or None (default), the same as in parse_text function
+
+
+    Returns a tuple with two elements:
+    -- 1D integer numpy array, index of the first level of each chunk
+       and the number of levels as the last element;
+    -- data type of leaf nodes.
+    '''
+
+    nrows, ndigits = zip(*mapper(count_rows, [(src, i, j) for i, j in chunks]))
+
+    if dtype is None:
+
+        dtype = narrowest_dtype(10 ** max(ndigits) - 1)
+
+        if dtype.kind != 'u':
+            raise ValueError('Node values exceed the range of 64-bit integers.')
+
+    return np.concatenate(([0], np.add.accumulate(nrows))), dtype
+
+
+def parse_levels(src, tar, chunks, first_lvls, dtype, mapper):
+    '''
+    Inputs:
+
+    src -- string, path to a text file
+
+    tar -- string, path to a raw binary file (.tri), will be overwritten
+
+    chunks -- list of tuples with two integers, ranges of bytes (output of split_text function)
+
+    first_lvls, dtype -- output of count_levels function
+
+    mapper -- starmap function (built-in or a method of a pool of workers)
+
+
+    Preallocates the output file (its header is not complete, the sum
+    of maximum values is zero) and writes leaf nodes of all chunks.
+
+
+    Returns LevelStats object, statistics of levels.
+    '''
+
+    nlvls = int(first_lvls[-1])
+
+    with open(file=tar, mode='wb') as f:
+        write_header(f, 0, nlvls, 0, dtype)
+        f.truncate(HEADER.itemsize + lvl_offset(nlvls) * np.dtype(dtype).itemsize)
+
+    argpack = [(src, i, j, tar, int(k), int(n), dtype)
+               for (i, j), k, n in zip(chunks, first_lvls, np.diff(first_lvls))]
+
+    lvl_stats = LevelStats(nlvls, dtype)
+
+    for k, chunk_stats in zip(first_lvls, mapper(parse_chunk, argpack)):
+        if chunk_stats is not None:
+            lvl_stats.update(int(k), chunk_stats)
+
+    return lvl_stats
+
+
+def parse_text(src, tar, dtype=None, nproc=1, stats=False):
+    '''
+    Inputs:
+
+    src
+    -- string, path to a text file (raw data)
+    -- the same format as expected by process_text function
+
+    tar -- string, path to a raw binary file (.tri), will be overwritten
+
+    dtype
+    -- numpy data type of leaf nodes
+    -- if None (default), the narrowest unsigned integer data type
+       that can store numbers with as many digits as the longest one
+
+    nproc -- positive integer (default is 1), number of worker processes
+
+    stats
+    -- boolean (default is False)
+    -- if True, statistics of levels are also returned
+
+
+    Splits the text into chunks of lines and converts each chunk
+    with a compiled byte-level decoder, in parallel. Leaf nodes are written directly
+    into the output file, no intermediate list of levels is created.
+    Statistics of levels are collected from chunks while they are parsed.
+    Leaf nodes are written to a temporary file next to the output file,
+    which replaces the output file only when the header is complete,
+    so a failed conversion never leaves a partial output file behind.
+    Exceptions raised while reading or writing files are not handled.
+
+
+    Returns a tuple with four elements:
+    -- root node value (integer);
+    -- number of levels (positive integer);
+    -- sum of maximum values in each level (positive integer);
+    -- data type of leaf nodes;
+    and LevelStats object as the fifth element if requested.
+    '''
+
+    root_node, begin, end = text_range(src)
+
+    chunks = split_text(src, begin, end, max(nproc, (end - begin) // CHUNK_SIZE + 1))
+
+    # Temporary output file, renamed when complete
+    part = tar + '.part'
+
+    try:
+
+        with Pool(processes=nproc) if nproc > 1 else nullcontext() as workers:
+
+            mapper = workers.starmap if workers else starmap
+
+            first_lvls, dtype = count_levels(src, chunks, mapper, dtype)
+
+            lvl_stats = parse_levels(src, part, chunks, first_lvls, dtype, mapper)
+
+        nlvls = int(first_lvls[-1])
+        max_sum = lvl_stats.max_sum()
+
+        with open(file=part, mode='r+b') as f:
+            write_header(f, root_node, nlvls, max_sum, dtype)
+
+        replace(part, tar)
+
+    except BaseException:
+        if path.exists(part):
+            remove(part)
+        raise
+
+    if stats:
+        return root_node, nlvls, max_sum, np.dtype(dtype), lvl_stats
+
+    return root_node, nlvls, max_sum, np.dtype(dtype)
+
+
+def process_text(src, compress=False, nproc=1, pack=False):
     '''
     Inputs:
 
@@ -52,18 +575,34 @@ def process_text(src):
     -- nodes must be separated by a single space
     -- each paragraph represents a level (row) of a triangle
 
+    compress
+    -- boolean, format of the output file
+    -- if False (default), save uncompressed raw binary file (.tri)
+       that can be memory-mapped
+    -- if True, save compressed binary file (.npz), suitable for archiving
+
+    nproc -- positive integer (default is 1), number of worker processes
+
+    pack
+    -- boolean, if True (default is False) and compress is False,
+       save packed triangle file (.trp) with a fixed number of bits
+       per node, that can be memory-mapped (see PackedNodes class)
+
+
+    Process data and save result in a binary file with the same name
+    as source text file, but with .tri, .npz or .trp extension, and in the same folder.
+    Leaf nodes are stored with the narrowest unsigned integer data type
+    that fits the longest number in the text.
+
 
-    Process data and save result in a compressed binary file with the same
-    name as source text file, but with .npz extension, and in the same folder.
+    The binary file is created again if it is older than the text file.
 
 
-    Returns a string with an absolute path to the compressed binary file
+    Returns a string with an absolute path to the binary file
     if the file already exists or the given text data is correctly
     processed and saved, empty string otherwise.
     '''
 
-    data = {}
-
     try:
 
         assert path.isfile(src) and src.endswith('.txt')
@@ -72,17 +611,19 @@ def process_text(src):
         filename = path.split(src)[1]
         filename = path.splitext(filename)[0]
 
-        filename += '.npz'
+        filename += '.npz' if compress else '.trp' if pack else '.tri'
 
         tar = path.join(path.split(src)[0], filename)
 
-        if path.isfile(tar):
+        # Prepared data is stale if the source text file is newer
+        if path.isfile(tar) and path.getmtime(tar) >= path.getmtime(src):
             print('Data is already prepared:', tar, end='\n\n')
             return tar
 
-        with open(file=src, mode='rt', buffering=1) as f:
-            root_node = int(f.readline().strip())
-            levels = [np.fromiter(line.split(), dtype=np.uint8) for line in f]
+        # Compressed and packed files are made from a temporary raw binary file
+        raw = tar + '.part' if compress or pack else tar
+
+        parse_text(src, raw, None, nproc)
 
     except (IOError, OSError) as err:
         print('Cannot open:', src)
@@ -91,57 +632,120 @@ def process_text(src):
     except AssertionError:
         print('Expected a path to .txt file, got:', src)
 
+    except ValueError as err:
+        print('Cannot process:', src)
+        print(err)
+
     else:
-        data.update(**prepare_data(root_node, levels))
 
-    try:
+        try:
 
-        assert data, 'No data to save.'
+            if compress:
+                compress_raw(raw, tar)
+            elif pack:
+                pack_raw(raw, tar)
 
-        del data['level_totals']
+        except (IOError, OSError) as err:
+            print('Cannot save:', tar)
+            print(err.strerror if err.strerror else err)
 
-        with open(file=tar, mode='wb') as f:
-            np.savez_compressed(f, **data)
+        else:
+            print('File saved:', tar, end='\n\n')
+            return tar
 
-    except (IOError, OSError, AssertionError) as err:
-        print('Cannot save:', tar)
-        print(err.strerror if err.strerror else err)
+    return ''
 
-    else:
-        print('File saved:', tar, end='\n\n')
-        return tar
 
-    return ''
+def compress_raw(raw, tar):
+    '''
+    Inputs:
+
+    raw -- string, path to a raw binary file (.tri), removed afterwards
+
+    tar -- string, path to a compressed binary file (.npz), will be overwritten
+
+
+    Exceptions raised while reading or writing files are not handled.
+
+
+    This function does not return any value.
+    '''
+
+    root_node, nlvls, flat_triangle, max_sum = load_raw(raw)
+
+    with open(file=tar, mode='wb') as f:
+        np.savez_compressed(
+            f,
+            single_numbers=np.fromiter((root_node, nlvls, max_sum), dtype=np.uint64),
+            flat_triangle=flat_triangle
+        )
+
+    del flat_triangle
+    remove(raw)
+
+
+def pack_raw(raw, tar):
+    '''
+    Inputs:
+
+    raw -- string, path to a raw binary file (.tri), removed afterwards
+
+    tar -- string, path to a packed triangle file (.trp), will be overwritten
+
+
+    Exceptions raised while reading or writing files are not handled.
+
+
+    This function does not return any value.
+    '''
+
+    root_node, nlvls, flat_triangle, max_sum = load_raw(raw)
+
+    save_packed(tar, root_node, nlvls, max_sum, flat_triangle)
+
+    del flat_triangle
+    remove(raw)
 
 
 def load_data(filepath):
     '''
     Inputs:
 
-    filepath -- string, path to a (compressed) binary file
+    filepath
+    -- string, path to a binary file
+    -- raw binary file (.tri) is memory-mapped (read-only)
+    -- compressed binary file (.npz) is entirely loaded into memory
+    -- packed triangle file (.trp) is memory-mapped (read-only)
 
 
     Returns a tuple with four elements:
     -- root node value (positive integer);
     -- number of levels (positive integer);
-    -- sequence of leaf nodes (1D unsigned integer numpy array);
+    -- sequence of leaf nodes (1D unsigned integer numpy array,
+       the data type chosen by process_text function is preserved,
+       or PackedNodes object for .trp file);
     -- sum of maximum values in each levels (positive integer).
     '''
 
     try:
 
-        assert path.isfile(filepath) and filepath.endswith('.npz')
+        assert path.isfile(filepath) and filepath.endswith(('.tri', '.npz', '.trp'))
 
-        with np.load(filepath) as data:
-            root_node, nlvls, max_sum = data['single_numbers']
-            flat_triangle = data['flat_triangle']
+        if filepath.endswith('.tri'):
+            root_node, nlvls, flat_triangle, max_sum = load_raw(filepath)
+        elif filepath.endswith('.trp'):
+            root_node, nlvls, flat_triangle, max_sum = load_packed(filepath)
+        else:
+            with np.load(filepath) as data:
+                root_node, nlvls, max_sum = (int(num) for num in data['single_numbers'])
+                flat_triangle = data['flat_triangle']
 
     except (IOError, OSError) as err:
         print('Cannot open:', filepath)
         print(err.strerror if err.strerror else err)
 
     except AssertionError:
-        print('Expected a path to .npz file, got:', filepath)
+        print('Expected a path to .tri, .npz or .trp file, got:', filepath)
 
     else:
         nlvls = int(nlvls)
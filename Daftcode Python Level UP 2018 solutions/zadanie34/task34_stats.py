@@ -0,0 +1,184 @@
+import numpy as np
+from numba import jit
+
+from zadanie34.task34_utils import lvl_offset, sum_levels
+
+
+def level_stats(nlvls, triangle, first_lvl=0):
+    '''
+    Inputs:
+
+    nlvls -- positive integer, number of levels
+
+    triangle
+    -- 1D unsigned integer numpy array (or numpy.memmap), sequence
+       of leaf nodes arranged from left to right and top to bottom
+    -- can be a part of a triangle that starts at the first node
+       of a given level
+
+    first_lvl -- non-negative integer (default is 0), index of the first level
+
+
+    Maxima and minima are computed for all levels at once, with a single
+    reduction over the whole array, split at the first node of each level.
+    Sums and positions of maxima are computed by compiled loops, as numpy
+    reductions with a wider accumulator are much slower.
+
+
+    Returns a dictionary with 1D numpy arrays, one element for each level:
+    -- totals -- the sum of all nodes (uint64);
+    -- maxima -- the largest node (the data type of nodes);
+    -- minima -- the smallest node (the data type of nodes);
+    -- argmax -- position of the first largest node in a level (int64).
+    '''
+
+    # Indexes of the first element in each row (relative to the first level)
+    offsets = lvl_offset(np.arange(first_lvl, first_lvl + nlvls, dtype=np.int64))
+    offsets -= offsets[0]
+
+    nodes = triangle[:lvl_offset(first_lvl + nlvls) - lvl_offset(first_lvl)]
+
+    maxima = np.maximum.reduceat(nodes, offsets)
+
+    totals = np.empty(shape=nlvls, dtype=np.uint64)
+    sum_levels(first_lvl, nodes, totals)
+
+    argmax = np.empty(shape=nlvls, dtype=np.int64)
+    find_first(first_lvl, nodes, maxima, argmax)
+
+    return {
+        'totals': totals,
+        'maxima': maxima,
+        'minima': np.minimum.reduceat(nodes, offsets),
+        'argmax': argmax
+    }
+
+
+@jit(nopython=True, cache=True)
+def find_first(first_lvl, nodes, values, out):
+    '''
+    Inputs:
+
+    first_lvl -- non-negative integer, index of the first level
+
+    nodes -- 1D unsigned integer numpy array, nodes of consecutive levels
+
+    values -- 1D numpy array, a value to find in each level
+
+    out -- 1D integer numpy array, modified in place
+
+
+    Scans each level only up to the first occurrence of a value.
+
+
+    This function does not return any value.
+    '''
+
+    n = 0
+
+    for k in range(values.size):
+
+        width = first_lvl + k + 2
+
+        for i in range(width):
+            if nodes[n+i] == values[k]:
+                out[k] = i
+                break
+
+        n += width
+
+
+def suffix_bounds(maxima):
+    '''
+    Inputs:
+
+    maxima -- 1D unsigned integer numpy array, the largest node of each level
+
+
+    Returns 1D unsigned integer numpy array (uint64) with one element more
+    than the input, the sum of maxima of each level and all levels below it
+    (an upper bound of a sum of a path from a given level to the bottom),
+    the last element is zero.
+    '''
+
+    bounds = np.zeros(shape=maxima.size + 1, dtype=np.uint64)
+
+    np.cumsum(maxima[::-1], dtype=np.uint64, out=bounds[-2::-1])
+
+    return bounds
+
+
+class LevelStats:
+    '''
+    Statistics of levels of a triangle, collected chunk by chunk
+    (in any order), for example while a text file is being parsed.
+
+    Attributes:
+
+    nlvls -- positive integer, number of levels
+
+    totals, maxima, minima, argmax -- 1D numpy arrays, the same
+                                      as returned by level_stats function
+    '''
+
+    def __init__(self, nlvls, dtype=np.uint64):
+        '''
+        Inputs:
+
+        nlvls -- positive integer, number of levels
+
+        dtype -- numpy data type of nodes (default is 64-bit unsigned integer)
+        '''
+
+        self.nlvls = nlvls
+        self.totals = np.zeros(shape=nlvls, dtype=np.uint64)
+        self.maxima = np.zeros(shape=nlvls, dtype=dtype)
+        self.minima = np.zeros(shape=nlvls, dtype=dtype)
+        self.argmax = np.zeros(shape=nlvls, dtype=np.int64)
+
+    def update(self, first_lvl, stats):
+        '''
+        Inputs:
+
+        first_lvl -- non-negative integer, index of the first level of a chunk
+
+        stats -- dictionary, output of level_stats function for a chunk
+
+
+        This function does not return any value.
+        '''
+
+        last_lvl = first_lvl + stats['totals'].size
+
+        for key in ('totals', 'maxima', 'minima', 'argmax'):
+            getattr(self, key)[first_lvl:last_lvl] = stats[key]
+
+    def add_nodes(self, first_lvl, nlvls, nodes):
+        '''
+        Inputs:
+
+        first_lvl -- non-negative integer, index of the first level of a chunk
+
+        nlvls -- positive integer, number of levels in a chunk
+
+        nodes -- 1D unsigned integer numpy array, nodes of a chunk
+
+
+        This function does not return any value.
+        '''
+
+        self.update(first_lvl, level_stats(nlvls, nodes, first_lvl))
+
+    def max_sum(self):
+        '''
+        Returns a non-negative integer, the sum of maximum values in each level.
+        '''
+
+        return int(np.sum(self.maxima, dtype=np.uint64))
+
+    def suffix_max(self):
+        '''
+        Returns 1D unsigned integer numpy array, output of suffix_bounds function.
+        '''
+
+        return suffix_bounds(self.maxima)
@@ -1,8 +1,27 @@
+from functools import wraps
+from os import path
+from tempfile import TemporaryDirectory
 from timeit import default_timer
 
 import numpy as np
 
-from zadanie34.task34_utils import fabricate_data, count_lvl_nodes
+from zadanie34.binary_genetic_algorithm import GAOptions
+from zadanie34.fitness_cache import FitnessCache
+from zadanie34.island_model import IslandOptions
+from zadanie34.task34 import (batch_bottom_up, beam_search, bottom_up_method, brute_force,
+                              gray_code_brute_force, simple_bottom_up, stream_top_down,
+                              vectorized_bottom_up)
+from zadanie34.task34_bnb import branch_and_bound
+from zadanie34.task34_ga import evolutionary_method, island_method
+from zadanie34.task34_generate import encode_levels
+from zadanie34.task34_incremental import AppendSolver, IncrementalSolver
+from zadanie34.task34_index import build_index
+from zadanie34.task34_packed import save_packed
+from zadanie34.task34_parallel import parallel_bottom_up, parallel_brute_force
+from zadanie34.task34_prep import load_data
+from zadanie34.task34_triangle import Triangle
+from zadanie34.task34_utils import (fabricate_data, count_lvl_nodes, lvl_offset, narrowest_dtype,
+                                    stack_triangles)
 
 
 def prep_test_cases(nlvls):
@@ -54,6 +73,9 @@ def prep_test_cases(nlvls):
 
         triangle = fabricate_data(nlvls, rand)[1]
 
+        # Random nodes are too narrow for large numbers of levels
+        triangle = triangle.astype(np.promote_types(triangle.dtype, narrowest_dtype(num)))
+
         steps = np.random.randint(low=0, high=2, size=nlvls, dtype=np.uint8)
         indexes = prev_lvl_nodes + np.add.accumulate(steps)
         triangle[indexes] = num
@@ -80,6 +102,8 @@ def test_output(fn, nlvls, verbose, *fnargs):
     -- reference to a function
     -- can take only positional arguments
     -- first three arguments must be: nlvls, max_sum, triangle
+    -- must return a tuple with the largest sum and the optimal path,
+       or only the largest sum (the path is not checked then)
 
     nlvls
     -- positive integer, number of levels
@@ -99,14 +123,19 @@ def test_output(fn, nlvls, verbose, *fnargs):
 
     results = []
 
-    for param, path, answer in zip(case_params, case_paths, case_answers):
+    for param, case_path, answer in zip(case_params, case_paths, case_answers):
 
-        output_total, output_path = fn(*param, *fnargs)
+        output = fn(*param, *fnargs)
 
-        results.append(np.all(output_path == path) and output_total == answer)
+        if isinstance(output, tuple):
+            output_total, output_path = output[:2]
+            results.append(np.all(output_path == case_path) and output_total == answer)
+        else:
+            output_total, output_path = output, None
+            results.append(output_total == answer)
 
         if verbose:
-            print('Expected:', path, answer)
+            print('Expected:', case_path, answer)
             print('Returned:', output_path, output_total, end='\n\n')
 
     raport = {
@@ -204,3 +233,310 @@ def test_speed(fn, nrep, nlvls, max_sum, triangle, *fnargs):
     template = [tmpl.format(**raport) for tmpl in template]
 
     print('\n'.join(template), end='\n\n')
+
+
+def without_max_sum(fn):
+    '''
+    Input:
+
+    fn
+    -- reference to a function
+    -- first two arguments must be: nlvls, triangle
+
+
+    Returns a function that takes nlvls, max_sum, triangle (max_sum is ignored),
+    so it can be tested with test_output function.
+    '''
+
+    @wraps(fn)
+    def wrapper(nlvls, max_sum, triangle, *fnargs):
+        del max_sum
+        return fn(nlvls, triangle, *fnargs)
+
+    return wrapper
+
+
+def with_dtype(fn, dtype):
+    '''
+    Input:
+
+    fn
+    -- reference to a function
+    -- first three arguments must be: nlvls, max_sum, triangle
+
+    dtype -- numpy integer data type
+
+
+    Returns a function that converts the triangle to a given data type
+    before calling fn, so it can be tested with test_output function.
+    '''
+
+    @wraps(fn)
+    def wrapper(nlvls, max_sum, triangle, *fnargs):
+        return fn(nlvls, max_sum, triangle.astype(dtype), *fnargs)
+
+    return wrapper
+
+
+def write_text(filepath, triangle, first_lvl, last_lvl, root_node=0):
+    '''
+    Input:
+
+    filepath -- string, path to a text file, levels are appended if root_node is None
+
+    triangle -- 1D unsigned integer numpy array, sequence of leaf nodes
+
+    first_lvl, last_lvl -- non-negative integers, range of written levels
+
+    root_node -- integer number or None (default is 0)
+
+
+    This function does not return any value.
+    '''
+
+    first, last = lvl_offset(first_lvl), lvl_offset(last_lvl)
+
+    with open(file=filepath, mode='ab' if root_node is None else 'wb') as f:
+        if root_node is not None:
+            f.write('{:d}\n'.format(root_node).encode())
+        f.write(encode_levels(first_lvl, last_lvl - first_lvl, triangle[first:last]).tobytes())
+
+
+def solve_stream(nlvls, max_sum, triangle):
+    '''
+    Input: the same as in bottom_up_method function
+
+
+    Writes the triangle to a temporary text file and reads it
+    with stream_top_down function.
+
+
+    Returns the largest sum of leaf nodes (positive integer).
+    '''
+
+    del max_sum
+
+    with TemporaryDirectory() as folder:
+
+        src = path.join(folder, 'triangle.txt')
+        write_text(src, triangle, 0, nlvls)
+
+        return stream_top_down(src)[2]
+
+
+def solve_appended(nlvls, max_sum, triangle):
+    '''
+    Input: the same as in bottom_up_method function
+
+
+    Writes the upper half of the triangle to a temporary text file,
+    solves it with AppendSolver and saves its state, then appends
+    the lower half and continues with a new solver that loads the state.
+
+
+    Returns the largest sum of leaf nodes (positive integer).
+    '''
+
+    del max_sum
+
+    with TemporaryDirectory() as folder:
+
+        src = path.join(folder, 'triangle.txt')
+
+        write_text(src, triangle, 0, nlvls // 2)
+
+        solver = AppendSolver(src)
+        solver.update()
+        solver.save()
+
+        write_text(src, triangle, nlvls // 2, nlvls, None)
+
+        return AppendSolver(src).update()
+
+
+def solve_batch(nlvls, max_sum, triangle):
+    '''
+    Input: the same as in bottom_up_method function
+
+
+    Stacks the triangle with a smaller random triangle and solves both
+    with batch_bottom_up function.
+
+
+    Returns a tuple with two elements, the same as bottom_up_method function.
+    '''
+
+    del max_sum
+
+    smaller = fabricate_data(max(1, nlvls // 2), True)[1]
+
+    batch_nlvls, triangles, _ = stack_triangles([smaller, triangle])
+
+    totals, best_paths = batch_bottom_up(batch_nlvls, triangles, True)
+
+    return int(totals[1]), best_paths[1][:nlvls]
+
+
+def solve_incremental(nlvls, max_sum, triangle):
+    '''
+    Input: the same as in bottom_up_method function
+
+
+    Creates IncrementalSolver from Triangle object, sets the first node
+    of the last level to zero and restores its value.
+
+
+    Returns a tuple with two elements, the same as bottom_up_method function.
+    '''
+
+    solver = IncrementalSolver(Triangle(triangle, nlvls, max_sum=max_sum))
+
+    value = solver.triangle[-nlvls-1]
+
+    solver.update(nlvls - 1, 0, 0)
+    solver.update(nlvls - 1, 0, value)
+
+    return int(solver.largest_sum()), solver.best_path()
+
+
+def solve_index(nlvls, max_sum, triangle):
+    '''
+    Input: the same as in bottom_up_method function
+
+
+    Builds a path index in a temporary file and asks for the best path
+    starting in the root node.
+
+
+    Returns a tuple with two elements, the same as bottom_up_method function.
+    '''
+
+    del max_sum
+
+    with TemporaryDirectory() as folder:
+
+        index = build_index(path.join(folder, 'triangle.idx'), 0, nlvls, triangle)
+
+        total, best_path = index.best_sum(), index.best_path()
+
+        del index
+
+    return total, best_path
+
+
+def solve_packed(nlvls, max_sum, triangle):
+    '''
+    Input: the same as in bottom_up_method function
+
+
+    Saves the triangle to a temporary packed triangle file, loads it
+    with load_data function and solves it with simple_bottom_up function,
+    which unpacks nodes row by row.
+
+
+    Returns the largest sum of leaf nodes (positive integer).
+    '''
+
+    with TemporaryDirectory() as folder:
+
+        tar = path.join(folder, 'triangle.trp')
+        save_packed(tar, 0, nlvls, max_sum, triangle)
+
+        nodes = load_data(tar)[2]
+
+        total = simple_bottom_up(nlvls, nodes)
+
+        del nodes
+
+    return total
+
+
+def solve_cached_evolution(nlvls, max_sum, triangle, *fnargs):
+    '''
+    Input: the same as in evolutionary_method function, without options
+
+
+    Runs evolutionary_method with a new fitness cache and elitism,
+    a cache must not be shared by different triangles.
+
+
+    Returns output of evolutionary_method function.
+    '''
+
+    options = GAOptions(fit_cache=FitnessCache(), elite=2)
+
+    return evolutionary_method(nlvls, max_sum, triangle, *fnargs, options)
+
+
+def check_solvers(nlvls=10, verbose=False, seed=0):
+    '''
+    Input:
+
+    nlvls
+    -- positive integer (default is 10), number of levels
+    -- at least 2, small enough for exhaustive search
+
+    verbose -- boolean (default is False), each individual test case will be printed if True
+
+    seed -- integer (default is 0), seed of random data
+
+
+    Tests output of all solvers with test_output function. Genetic algorithms
+    are not guaranteed to find optimal paths, their settings are enough
+    for about 10 levels. Beam search keeps all paths, so it is exact.
+
+
+    Returns True if all solvers passed all tests, False otherwise.
+    '''
+
+    ga_args = (100, 101, 0.7, 0.05)
+
+    checks = [
+        (bottom_up_method, ()),
+        (without_max_sum(simple_bottom_up), ()),
+        (without_max_sum(vectorized_bottom_up), ()),
+        (brute_force, (0, 1 << nlvls)),
+        (gray_code_brute_force, (0, 1 << nlvls)),
+        (gray_code_brute_force, (0, 1 << nlvls, nlvls // 2)),
+        (branch_and_bound, ()),
+        (branch_and_bound, (1,)),
+        (beam_search, (1 << nlvls,)),
+        (solve_stream, ()),
+        (solve_appended, ()),
+        (solve_incremental, ()),
+        (solve_index, ()),
+        (solve_packed, ()),
+        (solve_batch, ()),
+        (parallel_brute_force, (2, 64)),
+        (evolutionary_method, ga_args),
+        (evolutionary_method, ga_args + (GAOptions(packed=True),)),
+        (evolutionary_method, ga_args + (GAOptions(replace_rate=0.5),)),
+        (solve_cached_evolution, ga_args),
+        (island_method, ga_args + (IslandOptions(nislands=2, seed=seed),)),
+        (island_method, ga_args + (IslandOptions(nislands=2, seed=seed, packed=True,
+                                                 topology='full', elite=2),)),
+        (with_dtype(bottom_up_method, np.int64), ()),
+        (with_dtype(bottom_up_method, np.uint64), ()),
+        (with_dtype(without_max_sum(simple_bottom_up), np.int64), ()),
+        (with_dtype(without_max_sum(simple_bottom_up), np.uint64), ()),
+        (with_dtype(solve_incremental, np.int64), ()),
+        (with_dtype(solve_batch, np.uint64), ()),
+        (with_dtype(solve_index, np.int64), ()),
+        (with_dtype(solve_index, np.uint64), ()),
+        # Threads of numba are not fork-safe, so the threaded solver is tested
+        # after all solvers that fork worker processes
+        (without_max_sum(parallel_bottom_up), (16, 4)),
+        (with_dtype(without_max_sum(parallel_bottom_up), np.int64), (16, 4)),
+        (with_dtype(without_max_sum(parallel_bottom_up), np.uint64), (16, 4))
+    ]
+
+    np.random.seed(seed)
+
+    results = [test_output(fn, nlvls, verbose, *fnargs) for fn, fnargs in checks]
+
+    return all(results)
+
+
+if __name__ == '__main__':
+
+    check_solvers()
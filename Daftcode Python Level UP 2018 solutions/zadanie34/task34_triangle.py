@@ -0,0 +1,209 @@
+from functools import partial, wraps
+
+import numpy as np
+
+from zadanie34.task34_prep import load_data
+from zadanie34.task34_stats import level_stats
+from zadanie34.task34_utils import lvl_offset, row_offsets
+
+
+class Triangle:
+    '''
+    Lightweight container of a triangle, a flat sequence of leaf nodes
+    (numpy array or numpy.memmap, never copied) with its number of levels.
+    Offsets of levels are calculated in closed form, levels are returned
+    as views, derived values are calculated once, on first use.
+
+    Attributes:
+
+    nlvls -- positive integer, number of levels
+
+    nodes -- 1D unsigned integer numpy array (or numpy.memmap), leaf nodes
+             arranged from left to right and top to bottom
+
+    root_node -- integer number
+    '''
+
+    __slots__ = ('nlvls', 'nodes', 'root_node', '_max_sum', '_stats')
+
+    def __init__(self, nodes, nlvls=None, root_node=0, max_sum=None):
+        '''
+        Inputs:
+
+        nodes -- 1D unsigned integer numpy array (or numpy.memmap), leaf nodes
+
+        nlvls
+        -- positive integer, number of levels
+        -- if None (default), calculated from the number of nodes
+
+        root_node -- integer number (default is 0)
+
+        max_sum
+        -- positive integer, sum of maximum values in each level (row)
+        -- if None (default), calculated on first use
+        '''
+
+        if nlvls is None:
+            # Inverse of the arithmetic series: size = nlvls * (nlvls + 3) / 2
+            nlvls = int(round((np.sqrt(9 + 8 * nodes.size) - 3) / 2))
+
+        assert nodes.size >= lvl_offset(nlvls), 'Incomplete triangle.'
+
+        self.nlvls = nlvls
+        self.nodes = nodes
+        self.root_node = root_node
+        self._max_sum = max_sum
+        self._stats = None
+
+    @classmethod
+    def from_file(cls, filepath):
+        '''
+        Inputs:
+
+        filepath -- string, path to a binary file (.tri, .npz or .trp),
+                    the same as expected by load_data function
+
+
+        Nodes of a packed triangle file (.trp) are PackedNodes object,
+        they can be solved with simple_bottom_up function or unpacked.
+
+
+        Returns Triangle object or None if data cannot be loaded.
+        '''
+
+        data = load_data(filepath)
+
+        if data is None:
+            return None
+
+        root_node, nlvls, flat_triangle, max_sum = data
+
+        return cls(flat_triangle, nlvls, root_node, max_sum)
+
+    def __len__(self):
+        return self.nlvls
+
+    def __getitem__(self, lvl):
+        return self.row(lvl)
+
+    def __iter__(self):
+        return (self.row(lvl) for lvl in range(self.nlvls))
+
+    def __repr__(self):
+        return 'Triangle(nlvls={:d}, dtype={})'.format(self.nlvls, self.nodes.dtype)
+
+    @property
+    def offsets(self):
+        '''
+        1D integer numpy array (read-only), index of the first node in each level.
+        '''
+
+        return row_offsets(self.nlvls)
+
+    @property
+    def max_sum(self):
+        '''
+        Non-negative integer, sum of maximum values in each level (row).
+        '''
+
+        if self._max_sum is None:
+            self._max_sum = int(np.sum(self.stats['maxima'], dtype=np.uint64))
+
+        return self._max_sum
+
+    @property
+    def stats(self):
+        '''
+        Dictionary with statistics of levels, output of level_stats function.
+        '''
+
+        if self._stats is None:
+            self._stats = level_stats(self.nlvls, self.nodes)
+
+        return self._stats
+
+    def offset(self, lvl):
+        '''
+        Inputs:
+
+        lvl -- non-negative integer, index of a level (row), 0 is the highest one
+
+
+        Returns a non-negative integer, index of the first node in a level.
+        '''
+
+        return lvl_offset(lvl)
+
+    def row(self, lvl):
+        '''
+        Inputs:
+
+        lvl -- integer, index of a level (row), negative values count from the bottom
+
+
+        Returns 1D unsigned integer numpy array, nodes of a level (a view).
+        '''
+
+        if lvl < 0:
+            lvl += self.nlvls
+
+        if not 0 <= lvl < self.nlvls:
+            raise IndexError('No level {:d} in a triangle.'.format(lvl))
+
+        n = lvl_offset(lvl)
+
+        return self.nodes[n:n+lvl+2]
+
+    def astuple(self):
+        '''
+        Returns a tuple with three elements: number of levels,
+        sum of maximum values in each level and leaf nodes.
+        '''
+
+        return self.nlvls, self.max_sum, self.nodes
+
+
+def accepts_triangle(fn=None, fields=('nlvls', 'max_sum', 'nodes'), position=0):
+    '''
+    Inputs:
+
+    fn
+    -- reference to a solver (or a method)
+    -- arguments starting at a given position must match given fields,
+       for example: nlvls, max_sum, triangle
+
+    fields -- tuple of strings (default is nlvls, max_sum, nodes),
+              names of Triangle attributes replaced by the object
+
+    position -- non-negative integer (default is 0), position of the first
+                replaced argument (1 for methods and functions like build_index)
+
+
+    Decorator, the decorated solver also accepts Triangle object
+    in place of given arguments, other arguments are unchanged.
+    Can be used with or without arguments.
+
+    Functions that take data in other forms are not decorated:
+    stream_top_down and AppendSolver read text files, cached_solve reads
+    prepared data files, batch_bottom_up takes a stack of triangles
+    (see stack_triangles function) and PathIndex takes bottom-up totals
+    (build_index accepts Triangle object).
+
+
+    Returns a reference to the decorated function.
+    '''
+
+    if fn is None:
+        return partial(accepts_triangle, fields=fields, position=position)
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+
+        if len(args) > position and isinstance(args[position], Triangle):
+            tri = args[position]
+            head = tuple(getattr(tri, field) for field in fields)
+            args = args[:position] + head + args[position+1:]
+
+        return fn(*args, **kwargs)
+
+    return wrapper
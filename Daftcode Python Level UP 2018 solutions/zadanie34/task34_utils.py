@@ -1,4 +1,7 @@
+from functools import lru_cache
+
 import numpy as np
+from numba import jit
 
 
 def show_short_info(nlvls):
@@ -70,6 +73,170 @@ def count_lvl_nodes(nlvls):
     return prev_lvl_nodes, each_lvl_nodes
 
 
+@jit(nopython=True, cache=True)
+def lvl_offset(lvl):
+    '''
+    Inputs:
+
+    lvl -- non-negative integer, index of a level (row), 0 is the highest one
+
+
+    Closed form of the values returned by count_lvl_nodes function,
+    does not allocate any memory.
+
+
+    Returns a non-negative integer, total number of leaf nodes
+    in all previous levels (index of the first node in a given level).
+    '''
+
+    # Arithmetic series: 2 + 3 + ... + (lvl + 1)
+    return lvl * (lvl + 3) // 2
+
+
+@lru_cache(maxsize=16)
+def row_offsets(nlvls):
+    '''
+    Inputs:
+
+    nlvls -- positive integer, number of levels
+
+
+    Arrays are cached, so solvers called many times for triangles
+    of the same size do not allocate them again. Returned array
+    is read-only, as it is shared.
+
+
+    Returns 1D integer numpy array (int64), index of the first node
+    in each level (the same as the first array returned by
+    count_lvl_nodes function).
+    '''
+
+    offsets = lvl_offset(np.arange(nlvls, dtype=np.int64))
+    offsets.flags.writeable = False
+
+    return offsets
+
+
+def narrowest_dtype(max_value):
+    '''
+    Inputs:
+
+    max_value -- non-negative integer, the largest value to be stored
+
+
+    Returns numpy unsigned integer data type with the smallest number of bytes
+    that can store all values between zero and max_value (uint8, uint16,
+    uint32 or uint64).
+    '''
+
+    return np.min_scalar_type(int(max_value))
+
+
+def accumulator_dtype(nlvls, dtype):
+    '''
+    Inputs:
+
+    nlvls
+    -- positive integer, number of levels
+    -- number of nodes summed along a single path
+
+    dtype -- numpy integer data type of leaf nodes
+
+
+    The bound depends only on the number of levels and the data type,
+    so partial sums of any path never overflow, whatever values
+    are stored in a triangle. Sums are limited to 64 bits, so they can
+    overflow only for 64-bit (or very wide 32-bit) nodes close to
+    the largest values of their type.
+
+    Signed nodes get a signed accumulator, in numba arithmetic mixing
+    signed and unsigned 64-bit integers gives floating point numbers.
+
+
+    Returns numpy integer data type with the smallest number of bytes
+    that can store a sum of nlvls values of a given data type
+    (unsigned for unsigned nodes, at most 64 bits).
+    '''
+
+    info = np.iinfo(dtype)
+    bound = int(nlvls) * int(info.max)
+
+    if info.min < 0:
+        return np.min_scalar_type(-min(bound, int(np.iinfo(np.int64).max)))
+
+    return narrowest_dtype(min(bound, int(np.iinfo(np.uint64).max)))
+
+
+@jit(nopython=True, cache=True)
+def sum_levels(first_lvl, nodes, out):
+    '''
+    Inputs:
+
+    first_lvl -- non-negative integer, index of the first level
+
+    nodes -- 1D unsigned integer numpy array, nodes of consecutive levels
+
+    out
+    -- 1D unsigned integer numpy array (uint64), modified in place
+    -- its size is the number of levels
+
+
+    This function does not return any value.
+    '''
+
+    n = 0
+
+    for k in range(out.size):
+
+        width = first_lvl + k + 2
+        row = nodes[n:n+width]
+
+        total = np.uint64(0)
+
+        for i in range(width):
+            total += row[i]
+
+        out[k] = total
+        n += width
+
+
+def stack_triangles(triangles):
+    '''
+    Inputs:
+
+    triangles
+    -- sequence of 1D unsigned integer numpy arrays
+    -- each array is a sequence of leaf nodes arranged from left to right
+       and top to bottom, number of levels can be different
+
+
+    Smaller triangles are padded with levels of zeros at the bottom.
+    Zeros do not change sums of paths, so the largest sum of leaf nodes
+    stays the same and an optimal path of a padded triangle starts with
+    an optimal path of the original one (extra steps are zeros).
+
+
+    Returns a tuple with three elements:
+    -- the largest number of levels (positive integer);
+    -- 2D unsigned integer numpy array, one padded triangle in each row;
+    -- 1D unsigned integer numpy array, number of levels of each triangle.
+    '''
+
+    sizes = np.fromiter((tri.size for tri in triangles), dtype=np.int64)
+
+    # Inverse of the arithmetic series: size = nlvls * (nlvls + 3) / 2
+    nlvls = ((np.sqrt(9 + 8 * sizes) - 3) / 2).round().astype(np.uint32)
+
+    assert np.all(lvl_offset(nlvls.astype(np.int64)) == sizes), 'Incomplete triangle.'
+
+    stack = np.zeros(shape=(sizes.size, np.amax(sizes)), dtype=np.result_type(*triangles))
+
+    for row, tri in zip(stack, triangles):
+        row[:tri.size] = tri
+
+    return int(np.amax(nlvls)), stack, nlvls
+
+
 def calc_lvl_totals(triangle, prev_lvl_nodes, each_lvl_nodes):
     '''
     Inputs:
@@ -87,9 +254,12 @@ def calc_lvl_totals(triangle, prev_lvl_nodes, each_lvl_nodes):
     for each level (row).
     '''
 
-    lvl_totals = [np.sum(triangle[i:i+j]) for i, j in zip(prev_lvl_nodes, each_lvl_nodes)]
+    lvl_totals = np.empty(shape=prev_lvl_nodes.size, dtype=np.uint64)
 
-    return np.fromiter(lvl_totals, dtype=np.uint32)
+    # All levels are summed in a single compiled loop
+    sum_levels(0, triangle[:int(prev_lvl_nodes[-1]) + int(each_lvl_nodes[-1])], lvl_totals)
+
+    return lvl_totals
 
 
 def calc_max_sum(triangle, prev_lvl_nodes, each_lvl_nodes):
@@ -108,9 +278,11 @@ def calc_max_sum(triangle, prev_lvl_nodes, each_lvl_nodes):
     Returns an integer, the sum of maximum values in each level (row).
     '''
 
-    lvl_max = [np.amax(triangle[i:i+j]) for i, j in zip(prev_lvl_nodes, each_lvl_nodes)]
+    end = int(prev_lvl_nodes[-1]) + int(each_lvl_nodes[-1])
+
+    lvl_max = np.maximum.reduceat(triangle[:end], prev_lvl_nodes.astype(np.intp))
 
-    return np.sum(lvl_max, dtype=np.uint32)
+    return np.sum(lvl_max, dtype=np.uint64)
 
 
 def fabricate_data(nlvls, rand=False):
@@ -132,8 +304,9 @@ def fabricate_data(nlvls, rand=False):
 
     Returns a tuple with two elements:
     -- sum of maximum values in each levels (positive integer);
-    -- sequence of leaf nodes (1D unsigned integer numpy array)
-       arranged from left to right and top to bottom.
+    -- sequence of leaf nodes (1D unsigned integer numpy array
+       of the narrowest data type) arranged from left to right
+       and top to bottom.
     '''
 
     # Total number of possible paths: 1 << nlvls; 2 ** nlvls
@@ -144,9 +317,9 @@ def fabricate_data(nlvls, rand=False):
     n = np.sum(each_lvl_nodes)
 
     if rand:
-        flat_triangle = np.random.randint(low=10, high=100, size=n, dtype=np.uint32)
+        flat_triangle = np.random.randint(low=10, high=100, size=n, dtype=np.uint8)
     else:
-        flat_triangle = np.arange(start=1, stop=1+n, step=1, dtype=np.uint32)
+        flat_triangle = np.arange(start=1, stop=1+n, step=1, dtype=narrowest_dtype(n))
 
     max_sum = calc_max_sum(flat_triangle, prev_lvl_nodes, each_lvl_nodes)
 